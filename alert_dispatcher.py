@@ -0,0 +1,276 @@
+# alert_dispatcher.py
+"""
+Background dispatcher for breach alerts.
+
+Denials are enqueued as events; worker threads persist the Alert rows in
+batches and run the notification hook with retries, so the request path only
+pays for a queue put. If the dispatcher is not running, or its queue is full,
+the event is handled synchronously instead -- alerts are never dropped.
+
+A batch that fails to persist is retried with backoff, then written one
+event at a time; events that still cannot be written go to a retry list
+that the workers drain before the queue. Notifications are only sent for
+rows that have been committed. Callers that already stored their alerts
+(the batch access endpoint) use submit_persisted for the notification
+side alone.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import consent_cache
+from alerts_utils import log_alert, log_alerts, send_breach_alert
+from database import SessionLocal
+
+ALERT_WORKERS = int(os.getenv("ALERT_WORKERS", "2"))
+ALERT_BATCH_SIZE = int(os.getenv("ALERT_BATCH_SIZE", "200"))
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "10000"))
+ALERT_NOTIFY_RETRIES = int(os.getenv("ALERT_NOTIFY_RETRIES", "3"))
+ALERT_RETRY_BACKOFF = float(os.getenv("ALERT_RETRY_BACKOFF", "0.5"))
+ALERT_PERSIST_RETRIES = int(os.getenv("ALERT_PERSIST_RETRIES", "3"))
+
+
+class AlertDispatcher:
+    def __init__(self, workers: int = ALERT_WORKERS,
+                 batch_size: int = ALERT_BATCH_SIZE,
+                 queue_size: int = ALERT_QUEUE_SIZE,
+                 notify=send_breach_alert,
+                 session_factory=SessionLocal):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.notify = notify
+        self.session_factory = session_factory
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._retry = deque()  # events whose rows could not be written yet
+        self._stop = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.persisted = 0
+        self.notified = 0
+        self.persist_failures = 0
+        self.requeued = 0
+        self.notify_failures = 0
+        self.sync_fallbacks = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    # ---------------- Lifecycle ----------------
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"alert-dispatcher-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the workers after dispatching everything still queued."""
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                break
+            if len(self._dispatch(batch)) == len(batch):
+                # No progress: the database is still failing.
+                logging.error(f"[ALERT] {len(self._retry)} alerts could not be persisted before shutdown")
+                break
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    # ---------------- Producer side ----------------
+    def _enqueue(self, event) -> bool:
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def _notify_inline(self, db, user_id: int, patient_id: int, reason: str):
+        with self._stats_lock:
+            self.sync_fallbacks += 1
+        self._notify_with_retries(
+            consent_cache.get_user_name(db, user_id) if db is not None else f"User #{user_id}",
+            consent_cache.get_patient_name(db, patient_id) if db is not None else f"Patient #{patient_id}",
+            reason
+        )
+
+    def offer(self, user_id: int, patient_id: int, reason: str, access_log_id: int = None) -> bool:
+        """Queue a denial without any fallback. False if it could not be queued."""
+        return self._enqueue((user_id, patient_id, reason, access_log_id, time.monotonic(), False))
+
+    def submit(self, user_id: int, patient_id: int, reason: str, db=None, access_log_id: int = None):
+        """Queue a denial for alerting. Falls back to inline handling when needed."""
+        if self.offer(user_id, patient_id, reason, access_log_id):
+            return
+        log_alert(user_id, patient_id, reason, db=db, access_log_id=access_log_id)
+        self._notify_inline(db, user_id, patient_id, reason)
+
+    def submit_persisted(self, user_id: int, patient_id: int, reason: str, db=None, access_log_id: int = None):
+        """Queue the notification for an alert the caller has already committed."""
+        if not self._enqueue((user_id, patient_id, reason, access_log_id, time.monotonic(), True)):
+            self._notify_inline(db, user_id, patient_id, reason)
+
+    # ---------------- Worker side ----------------
+    def _take(self, block: bool = True):
+        batch = []
+        while self._retry and len(batch) < self.batch_size:
+            try:
+                batch.append(self._retry.popleft())
+            except IndexError:
+                break
+        if not batch:
+            try:
+                batch.append(self._queue.get(timeout=0.25) if block else self._queue.get_nowait())
+            except queue.Empty:
+                return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take()
+            if batch:
+                self._dispatch(batch)
+
+    def _dispatch(self, batch) -> list:
+        """Persist and notify a batch. Returns the events that had to be requeued."""
+        stored = [e for e in batch if e[5]]
+        persisted, failed = self._persist([e for e in batch if not e[5]])
+        if failed:
+            self._retry.extend(failed)
+            with self._stats_lock:
+                self.requeued += len(failed)
+
+        now = time.monotonic()
+        with self._stats_lock:
+            self.persisted += len(persisted)
+            for *_, enqueued_at, _ in persisted:
+                latency = now - enqueued_at
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+
+        # Only rows that are committed get a notification.
+        ready = stored + persisted
+        if ready:
+            db = self.session_factory()
+            try:
+                user_names = consent_cache.get_user_names(db, {e[0] for e in ready})
+                patient_names = consent_cache.get_patient_names(db, {e[1] for e in ready})
+            except Exception:
+                logging.exception("[ALERT] name lookup failed; notifying with ids")
+                user_names = {e[0]: f"User #{e[0]}" for e in ready}
+                patient_names = {e[1]: f"Patient #{e[1]}" for e in ready}
+            finally:
+                db.close()
+            for user_id, patient_id, reason, *_ in ready:
+                self._notify_with_retries(user_names[user_id], patient_names[patient_id], reason)
+        return failed
+
+    def _persist(self, events):
+        """
+        Write the alerts for `events`: the whole batch with retries and
+        backoff, then one event at a time. Returns (persisted, failed).
+        """
+        if not events:
+            return [], []
+        for attempt in range(1, ALERT_PERSIST_RETRIES + 1):
+            if self._write(events):
+                return events, []
+            if attempt < ALERT_PERSIST_RETRIES:
+                time.sleep(ALERT_RETRY_BACKOFF * attempt)
+        if len(events) == 1:
+            return [], events
+        persisted, failed = [], []
+        for event in events:
+            (persisted if self._write([event]) else failed).append(event)
+        return persisted, failed
+
+    def _write(self, events) -> bool:
+        db = self.session_factory()
+        try:
+            log_alerts([event[:4] for event in events], db)
+            return True
+        except Exception:
+            db.rollback()
+            with self._stats_lock:
+                self.persist_failures += len(events)
+            logging.exception(f"[ALERT] failed to persist {len(events)} alerts")
+            return False
+        finally:
+            db.close()
+
+    def _notify_with_retries(self, user_name: str, patient_name: str, reason: str):
+        for attempt in range(1, ALERT_NOTIFY_RETRIES + 1):
+            try:
+                self.notify(user_name=user_name, patient_name=patient_name, reason=reason)
+                with self._stats_lock:
+                    self.notified += 1
+                return True
+            except Exception:
+                logging.exception(f"[ALERT] notification attempt {attempt} failed")
+                if attempt < ALERT_NOTIFY_RETRIES:
+                    time.sleep(ALERT_RETRY_BACKOFF * attempt)
+        with self._stats_lock:
+            self.notify_failures += 1
+        return False
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "running": self.running,
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "persisted": self.persisted,
+                "notified": self.notified,
+                "persist_failures": self.persist_failures,
+                "requeued": self.requeued,
+                "retry_depth": len(self._retry),
+                "notify_failures": self.notify_failures,
+                "sync_fallbacks": self.sync_fallbacks,
+                "avg_dispatch_latency_ms": round(self._latency_total / self.persisted * 1000, 3) if self.persisted else 0.0,
+                "max_dispatch_latency_ms": round(self._latency_max * 1000, 3),
+            }
+
+
+dispatcher = AlertDispatcher()
+
+
+def submit(user_id: int, patient_id: int, reason: str, db=None, access_log_id: int = None):
+    dispatcher.submit(user_id, patient_id, reason, db=db, access_log_id=access_log_id)
+
+
+def offer(user_id: int, patient_id: int, reason: str, access_log_id: int = None) -> bool:
+    return dispatcher.offer(user_id, patient_id, reason, access_log_id=access_log_id)
+
+
+def submit_persisted(user_id: int, patient_id: int, reason: str, db=None, access_log_id: int = None):
+    dispatcher.submit_persisted(user_id, patient_id, reason, db=db, access_log_id=access_log_id)
+
+
+def start():
+    dispatcher.start()
+
+
+def stop():
+    dispatcher.stop()
@@ -1,27 +1,69 @@
 # alerts_utils.py
 import logging
 from datetime import datetime
+from crud import insert_with_ids
 from database import get_db
+import event_bus
 import models
 
 # Log alert in the database
-def log_alert(user_id: int, patient_id: int, reason: str, db=None):
+def log_alert(user_id: int, patient_id: int, reason: str, db=None, access_log_id: int = None):
     """Create an Alert record when a privacy breach occurs."""
-    if db is None:
+    owns_session = db is None
+    if owns_session:
         from database import SessionLocal
         db = SessionLocal()
 
-    alert = models.Alert(
-        user_id=user_id,
-        patient_id=patient_id,
-        message=f"Unauthorized access by user {user_id}: {reason}",
-        created_at=datetime.utcnow(),
-        resolved=False
-    )
-    db.add(alert)
-    db.commit()
-    logging.warning(f"[ALERT] {alert.message}")
-    return alert
+    try:
+        alert = models.Alert(
+            user_id=user_id,
+            patient_id=patient_id,
+            access_log_id=access_log_id,
+            message=f"Unauthorized access by user {user_id}: {reason}",
+            created_at=datetime.utcnow(),
+            resolved=False
+        )
+        db.add(alert)
+        db.commit()
+        logging.warning(f"[ALERT] {alert.message}")
+        event_bus.publish("alert", {
+            "id": alert.id, "user_id": user_id, "patient_id": patient_id, "access_log_id": access_log_id,
+            "message": alert.message, "created_at": alert.created_at, "resolved": False,
+        })
+        return alert
+    finally:
+        if owns_session:
+            db.close()
+
+
+# Log many alerts in one statement (batch access checks)
+def log_alerts(entries, db, commit: bool = True):
+    """
+    Bulk-create Alert records from (user_id, patient_id, reason, access_log_id)
+    tuples and return the inserted rows, with their new `id`. With
+    commit=False the caller commits and publishes the rows to the live feed.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "patient_id": patient_id,
+            "access_log_id": access_log_id,
+            "message": f"Unauthorized access by user {user_id}: {reason}",
+            "created_at": now,
+            "resolved": False,
+        }
+        for user_id, patient_id, reason, access_log_id in entries
+    ]
+    for row, alert_id in zip(rows, insert_with_ids(db, models.Alert, rows)):
+        row["id"] = alert_id
+    if commit:
+        db.commit()
+    for row in rows:
+        logging.warning(f"[ALERT] {row['message']}")
+        if commit:
+            event_bus.publish("alert", row)
+    return rows
 
 
 # Send simulated email alert (for demo)
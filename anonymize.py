@@ -1,6 +1,12 @@
 # anonymize.py
+import re
+from datetime import date, datetime
+from functools import lru_cache
 from hashlib import sha256
-from datetime import datetime
+
+PSEUDONYM_CACHE_SIZE = 100_000
+
+_ISO_DATE = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
 
 def _short_hash(value: str, length: int = 10) -> str:
     return sha256(value.encode("utf-8")).hexdigest()[:length]
@@ -17,6 +23,14 @@ def generalize_dob(dob: str) -> str:
     Accepts 'YYYY-MM-DD' or 'YYYY-MM' or 'YYYY'.
     Returns generalized DOB (year only). If parsing fails, returns 'Unknown'.
     """
+    # Fast path for the canonical YYYY-MM-DD form; anything else (or an
+    # invalid date) goes through strptime exactly as before.
+    m = _ISO_DATE.fullmatch(dob) if isinstance(dob, str) else None
+    if m:
+        try:
+            return str(date(int(m[1]), int(m[2]), int(m[3])).year)
+        except ValueError:
+            pass
     try:
         # try common formats
         for fmt in ("%Y-%m-%d", "%Y-%m", "%Y"):
@@ -32,6 +46,59 @@ def generalize_dob(dob: str) -> str:
 def hash_record_id(record_id: str) -> str:
     return f"REC-{_short_hash(record_id, 8)}"
 
+class Pseudonymizer:
+    """
+    Memoized, batch-capable front end for the masking functions above.
+
+    Each function gets its own bounded LRU memo keyed on its inputs, so a
+    column with a few thousand distinct users or patients only hashes each
+    value once. Output is identical to calling the plain functions.
+    """
+
+    def __init__(self, maxsize: int = PSEUDONYM_CACHE_SIZE):
+        self.mask_name = lru_cache(maxsize=maxsize)(mask_name)
+        self.mask_user = lru_cache(maxsize=maxsize)(mask_user)
+        self.generalize_dob = lru_cache(maxsize=maxsize)(generalize_dob)
+        self.hash_record_id = lru_cache(maxsize=maxsize)(hash_record_id)
+
+    @staticmethod
+    def _batch(fn, *columns) -> list:
+        # Compute once per distinct input, then fan back out to every row.
+        rows = list(zip(*columns)) if len(columns) > 1 else list(columns[0])
+        distinct = set(rows)
+        if len(columns) > 1:
+            lookup = {key: fn(*key) for key in distinct}
+        else:
+            lookup = {key: fn(key) for key in distinct}
+        return list(map(lookup.__getitem__, rows))
+
+    def mask_names(self, names) -> list:
+        return self._batch(self.mask_name, names)
+
+    def mask_users(self, names, roles) -> list:
+        return self._batch(self.mask_user, names, roles)
+
+    def generalize_dobs(self, dobs) -> list:
+        return self._batch(self.generalize_dob, dobs)
+
+    def hash_record_ids(self, record_ids) -> list:
+        return self._batch(self.hash_record_id, record_ids)
+
+    def cache_info(self) -> dict:
+        return {
+            name: getattr(self, name).cache_info()._asdict()
+            for name in ("mask_name", "mask_user", "generalize_dob", "hash_record_id")
+        }
+
+    def clear(self):
+        for name in ("mask_name", "mask_user", "generalize_dob", "hash_record_id"):
+            getattr(self, name).cache_clear()
+
+
+# Shared engine for exports and analytics.
+pseudonymizer = Pseudonymizer()
+
+
 def summarize_incident(user_name: str, user_role: str, patient_name: str, action: str, reason: str, when_utc) -> str:
     ts = when_utc.strftime("%Y-%m-%d %H:%M UTC")
     return (
@@ -0,0 +1,63 @@
+# benchmarks/_common.py
+"""Shared helpers for the benchmark scripts (run them from the repo root)."""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import select
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import models  # noqa: E402
+import synthetic_data  # noqa: E402
+from database import make_engine  # noqa: E402
+
+
+def temp_sqlite_engine(name: str = "bench.db", **kwargs):
+    """Engine on a throwaway SQLite file so benchmarks never touch the app database.
+
+    Uses the app's engine settings; pass sqlite_pragmas={} for stock SQLite.
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="phipa-bench-"), name)
+    return make_engine(f"sqlite:///{path}", **kwargs)
+
+
+def timeit(fn, repeat: int = 5):
+    """Run fn `repeat` times and return the median wall time in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def populate(engine, *, users: int, patients: int, logs: int = 0, consents: int = 0, alerts: int = 0,
+             days: float = 1, seed: int = 0, now=None) -> dict:
+    """Seed a benchmark database (schema already created) with synthetic_data.generate.
+
+    Users are all Doctors. `consents` and `alerts` are expected counts, turned
+    into generate's consent density and denial rate: every denied access
+    raises one alert, so at least `alerts` logs are written. Granted accesses
+    are drawn from consents, so with consents=0 each user still gets ~10.
+    """
+    logs = max(logs, alerts)
+    density = (consents or users * min(10, patients)) / (users * patients)
+    return synthetic_data.generate(
+        engine, roles={"Doctor": users}, patients=patients, consent_density=density, logs=logs,
+        days=days, denial_rate=alerts / logs if logs else 0.0, seed=seed, now=now,
+    )
+
+
+def sample_context(engine, n: int = 1000) -> dict:
+    """Ids for load generators to draw from: users, patients and consent pairs that allow `view`."""
+    with engine.connect() as conn:
+        users = conn.execute(select(models.User.id).limit(n)).scalars().all()
+        patients = conn.execute(select(models.Patient.id).limit(n)).scalars().all()
+        grants = conn.execute(
+            select(models.Consent.user_id, models.Consent.patient_id).where(models.Consent.can_view == True).limit(n)
+        ).all()
+    return {"users": users, "patients": patients, "grants": [tuple(g) for g in grants]}
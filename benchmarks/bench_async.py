@@ -0,0 +1,112 @@
+# benchmarks/bench_async.py
+"""
+Load test of the hot endpoints served by one uvicorn worker with the sync
+handlers (ASYNC_ENDPOINTS=0, threadpool-bound) versus the async ones
+(ASYNC_ENDPOINTS=1). Each client connection loops over a mix of
+POST /access/ (70%), GET /logs, /alerts and /metrics/overview (10% each).
+
+    python -m benchmarks.bench_async --concurrency 50 200 1000 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks._common import ROOT, populate, sample_context
+from benchmarks.bench_startup import _free_port, _get
+from database import make_engine
+from migrations import run_migrations
+
+USERS, PATIENTS = 200, 2000
+
+
+async def client(http, base, grants, stop_at, latencies, errors, seed):
+    rnd = random.Random(seed)
+    while time.monotonic() < stop_at:
+        pick = rnd.random()
+        start = time.perf_counter()
+        try:
+            if pick < 0.7:
+                # stay on consented pairs: denials would measure the alert pipeline instead
+                user, patient = rnd.choice(grants)
+                r = await http.post(f"{base}/access/", json={"user_id": user, "patient_id": patient, "action": "view"})
+            elif pick < 0.8:
+                r = await http.get(f"{base}/logs", params={"limit": 50})
+            elif pick < 0.9:
+                r = await http.get(f"{base}/alerts", params={"limit": 50})
+            else:
+                r = await http.get(f"{base}/metrics/overview")
+            r.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError as e:
+            errors.append(getattr(e, "response", None) and e.response.status_code or type(e).__name__)
+
+
+async def drive(base: str, grants: list, concurrency: int, seconds: float):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as http:
+        stop_at = time.monotonic() + seconds
+        await asyncio.gather(*(client(http, base, grants, stop_at, latencies, errors, i) for i in range(concurrency)))
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else float("nan")
+    return len(latencies) / seconds, pct(0.50), pct(0.99), errors
+
+
+def serve(cwd: str, url: str, async_endpoints: bool):
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=ROOT, DATABASE_URL=url, REPORT_PREGENERATE="0",
+               ASYNC_ENDPOINTS="1" if async_endpoints else "0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "error", "--backlog", "4096"],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during start-up")
+        try:
+            _get(f"{base}/health", timeout=1)
+            return proc, base
+        except OSError:
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--logs", type=int, default=100_000)
+    args = parser.parse_args()
+
+    cwd = tempfile.mkdtemp(prefix="phipa-bench-")
+    url = f"sqlite:///{os.path.join(cwd, 'bench.db')}"
+    engine = make_engine(url)
+    run_migrations(engine)
+    populate(engine, users=USERS, patients=PATIENTS, logs=args.logs, seed=18)
+    grants = sample_context(engine)["grants"]
+    engine.dispose()
+
+    print(f"{'mode':<6} {'conns':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'errors':>7}")
+    for async_endpoints in (False, True):
+        proc, base = serve(cwd, url, async_endpoints)
+        try:
+            for concurrency in args.concurrency:
+                rps, p50, p99, errors = asyncio.run(drive(base, grants, concurrency, args.seconds))
+                mode = "async" if async_endpoints else "sync"
+                print(f"{mode:<6} {concurrency:>6} {rps:8.1f} {p50:8.1f} {p99:9.1f} {len(errors):>7}"
+                      + (f"  {dict(Counter(errors))}" if errors else ""))
+        finally:
+            proc.terminate()
+            proc.wait(10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_db_modes.py
+"""
+Mixed read/write load against the storage backend: writer threads record
+access decisions through crud.log_access (one commit each, like POST
+/access/) while reader threads poll the dashboard queries (/metrics/overview,
+/logs and a full-table count). Compares stock SQLite (rollback journal,
+synchronous=FULL) with the tuned per-connection pragmas from database.py,
+and optionally any other DATABASE_URL such as Postgres.
+
+    python -m benchmarks.bench_db_modes --seconds 10 --writers 2 --readers 4
+    python -m benchmarks.bench_db_modes --url postgresql+psycopg://user:pw@localhost/bench
+"""
+import argparse
+import random
+import threading
+import time
+
+from fastapi import Response
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._common import populate, temp_sqlite_engine
+import crud
+import models
+import schemas
+from database import Base, make_engine
+from routers.metrics import get_logs, metrics_overview
+
+
+def _pct(samples, q):
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def run_mode(engine, seconds: float, writers: int, readers: int) -> dict:
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    stop = threading.Event()
+    write_ms, read_ms, errors = [], [], []
+    lock = threading.Lock()
+
+    def writer(seed):
+        rnd = random.Random(seed)
+        while not stop.is_set():
+            db = Session()
+            data = schemas.AccessLogBase(user_id=rnd.randint(1, 200), patient_id=rnd.randint(1, 2000), action="view")
+            start = time.perf_counter()
+            try:
+                crud.log_access(db, data, authorized=True)
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    write_ms.append(elapsed)
+            except OperationalError as e:
+                db.rollback()
+                with lock:
+                    errors.append(str(e.orig))
+            finally:
+                db.close()
+
+    def reader(seed):
+        rnd = random.Random(seed)
+        while not stop.is_set():
+            db = Session()
+            start = time.perf_counter()
+            try:
+                choice = rnd.random()
+                if choice < 0.4:
+                    metrics_overview(db=db, since_minutes=1440)
+                elif choice < 0.8:
+                    get_logs(Response(), db=db, limit=100, user_id=None, patient_id=None,
+                             action=None, since_minutes=1440, cursor=None)
+                else:
+                    db.query(func.count(models.AccessLog.id)).filter(models.AccessLog.action == "edit").scalar()
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    read_ms.append(elapsed)
+            except OperationalError as e:
+                with lock:
+                    errors.append(str(e.orig))
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(100 + i,)) for i in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return {
+        "writes_per_s": len(write_ms) / seconds,
+        "write_p50": _pct(write_ms, 0.50), "write_p99": _pct(write_ms, 0.99),
+        "reads_per_s": len(read_ms) / seconds,
+        "read_p50": _pct(read_ms, 0.50), "read_p99": _pct(read_ms, 0.99),
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--logs", type=int, default=200_000)
+    parser.add_argument("--url", help="also benchmark this DATABASE_URL (its tables are dropped and recreated)")
+    args = parser.parse_args()
+
+    modes = [
+        ("sqlite stock", lambda: temp_sqlite_engine(sqlite_pragmas={})),
+        ("sqlite tuned", lambda: temp_sqlite_engine()),
+    ]
+    if args.url:
+        modes.append((args.url.split(":", 1)[0], lambda: make_engine(args.url)))
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:.0f} s, {args.logs} seeded logs\n")
+    print(f"{'mode':<16} {'writes/s':>9} {'w p50':>7} {'w p99':>8} {'reads/s':>8} {'r p50':>7} {'r p99':>8} {'errors':>7}")
+    for name, factory in modes:
+        engine = factory()
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        populate(engine, users=200, patients=2000, logs=args.logs, alerts=args.logs // 20, seed=17)
+        r = run_mode(engine, args.seconds, args.writers, args.readers)
+        engine.dispose()
+        print(f"{name:<16} {r['writes_per_s']:9.1f} {r['write_p50']:7.1f} {r['write_p99']:8.1f} "
+              f"{r['reads_per_s']:8.1f} {r['read_p50']:7.1f} {r['read_p99']:8.1f} {r['errors']:7d}")
+    print("\nlatencies in ms")
+
+
+if __name__ == "__main__":
+    main()
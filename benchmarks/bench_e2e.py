@@ -0,0 +1,275 @@
+# benchmarks/bench_e2e.py
+"""
+End-to-end load test: one uvicorn worker on a synthetic dataset
+(synthetic_data.py), with every router driven in turn at a fixed concurrency.
+For each scenario it reports throughput, p50/p95/p99 latency, errors and SQL
+statements per request. Results are written as JSON; pass an earlier file
+as --compare to see the change between two commits.
+
+    python -m benchmarks.bench_e2e --logs 1000000 --concurrency 32 --seconds 10
+    python -m benchmarks.bench_e2e --compare bench_e2e-1a2b3c4.json
+    python -m benchmarks.bench_e2e --database-url postgresql://... --scenarios logs overview
+
+Statements are counted in the server process with a cursor-execute listener
+on both engines. A scenario's count is divided by its completed requests,
+so background work it causes (buffered log flushes, alert dispatch) is
+included. Streaming feeds (/live/events, /live/ws) have no request latency
+to measure; /live/stats stands in for the live router. POST scenarios add
+rows, so --database-url is best pointed at a disposable database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+import httpx
+
+from benchmarks._common import ROOT, sample_context
+from benchmarks.bench_startup import _free_port, _get
+import synthetic_data
+from database import make_engine
+from migrations import run_migrations
+
+SQL_COUNTER_PATH = "/__bench__/sql"
+
+# Runs in the server process: count statements on both engines, then serve the app.
+SERVER = f"""
+import sys, threading
+import uvicorn
+from sqlalchemy import event
+import database, main
+
+count = 0
+lock = threading.Lock()
+
+def on_execute(*args):
+    global count
+    with lock:
+        count += 1
+
+engines = [database.engine]
+if database.ASYNC_ENDPOINTS:
+    engines.append(database.get_async_engine().sync_engine)
+for eng in engines:
+    event.listen(eng, "before_cursor_execute", on_execute)
+
+@main.app.get({SQL_COUNTER_PATH!r}, include_in_schema=False)
+def sql_statements():
+    return {{"statements": count}}
+
+uvicorn.run(main.app, host="127.0.0.1", port=int(sys.argv[1]), log_level="error", backlog=4096)
+"""
+
+
+# ---------------- Scenarios ----------------
+# name -> (router, method, request builder[, expected status, default 200]). Builders get
+# (rnd, ctx) and return (path, params, json body).
+SCENARIOS = {
+    "users_list": ("users", "GET", lambda r, c: ("/users/", {"limit": 50}, None)),
+    "users_search": ("users", "GET", lambda r, c: ("/users/", {"search": "Nurse 1", "limit": 50}, None)),
+    "patients_list": ("patients", "GET", lambda r, c: ("/patients/", {"limit": 50}, None)),
+    "consents_list": ("consents", "GET", lambda r, c: ("/consents/", None, None)),
+    "access_granted": ("access", "POST", lambda r, c: ("/access/", None, _access(*r.choice(c["grants"]), "view"))),
+    # Denials answer 403 by design; export is never granted.
+    "access_denied": ("access", "POST", lambda r, c: ("/access/", None, _access(r.choice(c["users"]), r.choice(c["patients"]), "export")), 403),
+    "access_batch": ("access", "POST", lambda r, c: ("/access/batch", None, {"items": [
+        _access(*r.choice(c["grants"]), "view") for _ in range(10)
+    ]})),
+    "logs": ("metrics", "GET", lambda r, c: ("/logs", {"limit": 100}, None)),
+    "logs_user_90d": ("metrics", "GET", lambda r, c: ("/logs", {"limit": 100, "user_id": r.choice(c["users"]), "since_minutes": 90 * 1440}, None)),
+    "overview": ("metrics", "GET", lambda r, c: ("/metrics/overview", {"since_minutes": 1440}, None)),
+    "consent_matrix": ("metrics", "GET", lambda r, c: ("/consent-matrix", {"sparse": True, "limit": 100}, None)),
+    "consent_check": ("metrics", "GET", lambda r, c: ("/consent-matrix/check", {"user_id": r.choice(c["users"]), "patient_id": r.choice(c["patients"])}, None)),
+    "alerts": ("alerts", "GET", lambda r, c: ("/alerts/", {"limit": 50}, None)),
+    "alerts_unresolved": ("metrics", "GET", lambda r, c: ("/alerts", {"limit": 50, "unresolved_only": True}, None)),
+    "incidents": ("incidents", "GET", lambda r, c: ("/incidents/summaries", {"limit": 20}, None)),
+    "report_audit": ("reports", "GET", lambda r, c: ("/reports/audit", {"since_minutes": 1440}, None)),
+    "export_logs_1h": ("exports", "GET", lambda r, c: ("/export/anonymized/logs", {"since_minutes": 60}, None)),
+    "download_logs_csv": ("downloads", "GET", lambda r, c: ("/download/logs", {"format": "csv", "since_minutes": 60, "limit": 1000}, None)),
+    "live_stats": ("live", "GET", lambda r, c: ("/live/stats", None, None)),
+    "health": ("main", "GET", lambda r, c: ("/health", None, None)),
+}
+
+
+def _access(user_id, patient_id, action):
+    return {"user_id": user_id, "patient_id": patient_id, "action": action}
+
+
+# ---------------- Load ----------------
+async def client(http, base, scenario, ctx, stop_at, latencies, errors, seed):
+    rnd = random.Random(seed)
+    _, method, build, *expected = SCENARIOS[scenario]
+    expected = expected[0] if expected else 200
+    while time.monotonic() < stop_at:
+        path, params, body = build(rnd, ctx)
+        start = time.perf_counter()
+        try:
+            r = await http.request(method, f"{base}{path}", params=params, json=body)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        if r.status_code == expected:
+            latencies.append((time.perf_counter() - start) * 1000)
+        else:
+            errors.append(r.status_code)
+
+
+async def drive(base: str, scenario: str, ctx: dict, concurrency: int, seconds: float):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as http:
+        stop_at = time.monotonic() + seconds
+        await asyncio.gather(*(
+            client(http, base, scenario, ctx, stop_at, latencies, errors, i) for i in range(concurrency)
+        ))
+    return latencies, errors
+
+
+def sql_statements(base: str) -> int:
+    return json.loads(_get(f"{base}{SQL_COUNTER_PATH}")[1])["statements"]
+
+
+def run_scenario(base: str, scenario: str, ctx: dict, concurrency: int, seconds: float) -> dict:
+    rnd = random.Random(0)
+    path, params, body = SCENARIOS[scenario][2](rnd, ctx)
+    httpx.request(SCENARIOS[scenario][1], f"{base}{path}", params=params, json=body, timeout=120)  # warm-up
+
+    before = sql_statements(base)
+    start = time.perf_counter()
+    latencies, errors = asyncio.run(drive(base, scenario, ctx, concurrency, seconds))
+    elapsed = time.perf_counter() - start
+    time.sleep(0.5)  # let buffered writes triggered by the scenario land
+    statements = sql_statements(base) - before
+
+    latencies.sort()
+    pct = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 2) if latencies else None
+    return {
+        "router": SCENARIOS[scenario][0],
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+        "errors": dict(Counter(map(str, errors))),
+        "sql_per_request": round(statements / len(latencies), 2) if latencies else None,
+    }
+
+
+def serve(cwd: str, url: str):
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=ROOT, DATABASE_URL=url, REPORT_PREGENERATE="0",
+               PARTITION_MAINTENANCE_DELAY="86400")
+    proc = subprocess.Popen([sys.executable, "-W", "ignore", "-c", SERVER, str(port)], cwd=cwd, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during start-up")
+        try:
+            _get(f"{base}/health", timeout=1)
+            return proc, base
+        except OSError:
+            time.sleep(0.1)
+
+
+# ---------------- Results ----------------
+def git_revision() -> str:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results: dict, baseline: dict = None):
+    header = f"{'scenario':<20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql/req':>8} {'errors':>7}"
+    print(header + ("  vs baseline (req/s, p99)" if baseline else ""))
+    for name, r in results.items():
+        line = (f"{name:<20} {r['rps']:8.1f} {r['p50_ms'] or 0:8.1f} {r['p95_ms'] or 0:8.1f} {r['p99_ms'] or 0:8.1f} "
+                f"{r['sql_per_request'] or 0:8.2f} {sum(r['errors'].values()):>7}")
+        old = (baseline or {}).get(name)
+        if old and old["rps"] and old["p99_ms"] and r["p99_ms"]:
+            line += f"  {(r['rps'] / old['rps'] - 1) * 100:+6.1f}%  {(r['p99_ms'] / old['p99_ms'] - 1) * 100:+6.1f}%"
+            if r["sql_per_request"] != old["sql_per_request"]:
+                line += f"  sql/req {old['sql_per_request']} -> {r['sql_per_request']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", help="run against this database in place instead of generating one")
+    parser.add_argument("--users", type=synthetic_data.parse_roles, default=synthetic_data.DEFAULT_ROLES)
+    parser.add_argument("--patients", type=int, default=20_000)
+    parser.add_argument("--consent-density", type=float, default=0.005)
+    parser.add_argument("--logs", type=int, default=500_000)
+    parser.add_argument("--days", type=float, default=90)
+    parser.add_argument("--denial-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--out", help="results file (default: bench_e2e-<git revision>.json)")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    cwd = tempfile.mkdtemp(prefix="phipa-bench-")
+    dataset = {"database_url": args.database_url}
+    url = args.database_url
+    if url is None:
+        url = f"sqlite:///{os.path.join(cwd, 'bench.db')}"
+        engine = make_engine(url)
+        run_migrations(engine)
+        print(f"generating {args.logs:,} logs, {args.patients:,} patients ...")
+        dataset = {
+            "users": args.users, "patients": args.patients, "consent_density": args.consent_density,
+            "logs": args.logs, "days": args.days, "denial_rate": args.denial_rate,
+            "load": synthetic_data.generate(engine, args.users, args.patients, args.consent_density, args.logs,
+                                            args.days, args.denial_rate),
+        }
+    else:
+        engine = make_engine(url)
+    ctx = sample_context(engine)
+    engine.dispose()
+
+    revision = git_revision()
+    proc, base = serve(cwd, url)
+    results = {}
+    try:
+        for scenario in args.scenarios:
+            results[scenario] = run_scenario(base, scenario, ctx, args.concurrency, args.seconds)
+            print(f"  {scenario}: {results[scenario]['rps']} req/s", file=sys.stderr)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    out = args.out or f"bench_e2e-{revision}.json"
+    with open(out, "w") as f:
+        json.dump({
+            "revision": revision,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "concurrency": args.concurrency,
+            "seconds": args.seconds,
+            "dataset": dataset,
+            "results": results,
+        }, f, indent=2)
+    print(f"\nresults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_exports.py
+"""
+Time-to-first-byte, throughput and peak RSS of the streaming anonymized log
+export.
+
+    python -m benchmarks.bench_exports --rows 5000000
+    python -m benchmarks.bench_exports --rows 500000 --legacy   # also run the old .all() + StringIO path
+
+Peak RSS is a process high-water mark, so the streaming export runs first.
+"""
+import argparse
+import csv
+import resource
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._common import populate, temp_sqlite_engine
+import models
+from anonymize import mask_name, mask_user
+from database import Base
+from routers.exports import iter_anonymized_logs
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def legacy_export(Session, since_ts):
+    """The pre-streaming implementation: materialize everything, then encode."""
+    db = Session()
+    try:
+        logs = db.query(models.AccessLog).filter(models.AccessLog.timestamp >= since_ts).order_by(models.AccessLog.timestamp.desc()).all()
+        users = {u.id: u for u in db.query(models.User).all()}
+        pats = {p.id: p for p in db.query(models.Patient).all()}
+        buf = StringIO()
+        writer = csv.writer(buf)
+        for lg in logs:
+            u = users.get(lg.user_id)
+            p = pats.get(lg.patient_id)
+            writer.writerow([lg.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                             mask_user(u.name if u else f"User{lg.user_id}", u.role if u else "user"),
+                             mask_name(p.name if p else f"Patient{lg.patient_id}"),
+                             lg.action, "True" if lg.is_authorized else "False"])
+        yield buf.getvalue()
+    finally:
+        db.close()
+
+
+def measure(label, chunks):
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    first = None
+    total = 0
+    for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - start
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} ttfb={first * 1000:9.1f} ms  total={elapsed:7.1f} s  "
+          f"{total / elapsed / 1e6:6.1f} MB/s  peak RSS={peak_rss_mb():7.0f} MB (+{peak_rss_mb() - rss_before:.0f})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    engine = temp_sqlite_engine()
+    Base.metadata.create_all(bind=engine)
+    start = time.perf_counter()
+    populate(engine, users=args.users, patients=args.patients, logs=args.rows, seed=7)
+    print(f"Loaded {args.rows:,} access logs in {time.perf_counter() - start:.1f}s")
+
+    Session = sessionmaker(bind=engine)
+    since_ts = datetime.utcnow() - timedelta(days=2)
+    measure("streaming", iter_anonymized_logs(since_ts, session_factory=Session))
+    if args.legacy:
+        measure("legacy", legacy_export(Session, since_ts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_indexes.py
+"""
+Query time for the hot access-log / consent / alert queries before and after
+the migration-002 indexes.
+
+    python -m benchmarks.bench_indexes --rows 1000000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._common import populate, temp_sqlite_engine, timeit
+import models
+from database import Base
+from migrations import m002_hot_query_indexes
+
+INDEX_NAMES = [
+    index.name
+    for model in (models.AccessLog, models.Consent, models.Alert)
+    for index in model.__table__.indexes
+]
+
+
+def queries(Session, users: int, patients: int):
+    since = datetime.utcnow() - timedelta(hours=24)
+    AL = models.AccessLog
+
+    def run(build):
+        def _run():
+            db = Session()
+            try:
+                build(db)
+            finally:
+                db.close()
+        return _run
+
+    return {
+        "logs window (limit 100)": run(lambda db: db.query(AL).filter(AL.timestamp >= since)
+                                       .order_by(AL.timestamp.desc()).limit(100).all()),
+        "logs by user": run(lambda db: db.query(AL).filter(AL.user_id == users // 2, AL.timestamp >= since)
+                            .order_by(AL.timestamp.desc()).limit(100).all()),
+        "logs by patient": run(lambda db: db.query(AL).filter(AL.patient_id == patients // 2)
+                               .order_by(AL.timestamp.desc()).limit(100).all()),
+        "overview counts": run(lambda db: (
+            db.query(func.count(AL.id)).filter(AL.timestamp >= since).scalar(),
+            db.query(func.count(AL.id)).filter(AL.timestamp >= since, AL.is_authorized == False).scalar(),
+        )),
+        "consent lookup": run(lambda db: db.query(models.Consent).filter_by(
+            user_id=users // 3, patient_id=patients // 3).first()),
+        "open alerts (limit 50)": run(lambda db: db.query(models.Alert.id).filter(models.Alert.resolved == False)
+                                      .order_by(models.Alert.created_at.desc()).limit(50).all()),
+        "open alert count": run(lambda db: db.query(func.count(models.Alert.id))
+                                .filter(models.Alert.resolved == False).scalar()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--patients", type=int, default=200_000)
+    parser.add_argument("--consents", type=int, default=200_000)
+    parser.add_argument("--alerts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    engine = temp_sqlite_engine()
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in INDEX_NAMES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    start = time.perf_counter()
+    populate(engine, users=args.users, patients=args.patients, logs=args.rows,
+             consents=args.consents, alerts=args.alerts, days=90, seed=42)
+    print(f"Loaded {args.rows:,} access logs in {time.perf_counter() - start:.1f}s\n")
+
+    Session = sessionmaker(bind=engine)
+    before = {name: timeit(fn) for name, fn in queries(Session, args.users, args.patients).items()}
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        m002_hot_query_indexes(conn)
+    print(f"Built indexes in {time.perf_counter() - start:.1f}s\n")
+    after = {name: timeit(fn) for name, fn in queries(Session, args.users, args.patients).items()}
+
+    print(f"{'query':<26}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in before:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<26}{before[name]:>12.2f}{after[name]:>12.2f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
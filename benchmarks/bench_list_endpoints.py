@@ -0,0 +1,60 @@
+# benchmarks/bench_list_endpoints.py
+"""
+Response time and peak Python memory of the /users and /patients list
+queries with many alerts in the table: the old eager-joined ORM load versus
+the column-only projection used by crud.get_users / crud.get_patients.
+
+    python -m benchmarks.bench_list_endpoints --alerts 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from benchmarks._common import populate, temp_sqlite_engine
+import crud
+import models
+import schemas
+from database import Base
+
+
+def measure(label, Session, fn, response_model):
+    db = Session()
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = fn(db)
+    payload = [response_model.model_validate(r, from_attributes=True).model_dump() for r in rows]
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+    print(f"{label:<28} {len(payload):>7} rows  {elapsed:9.1f} ms  peak {peak / 2**20:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--patients", type=int, default=20_000)
+    parser.add_argument("--alerts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    engine = temp_sqlite_engine()
+    Base.metadata.create_all(bind=engine)
+    populate(engine, users=args.users, patients=args.patients, alerts=args.alerts, seed=11)
+    Session = sessionmaker(bind=engine)
+    print(f"{args.users:,} users, {args.patients:,} patients, {args.alerts:,} alerts\n")
+
+    # The previous models declared these relationships lazy="joined".
+    measure("users: eager-joined (old)", Session,
+            lambda db: db.query(models.User).options(joinedload(models.User.alerts_user)).all(),
+            schemas.UserResponse)
+    measure("users: projection (new)", Session, crud.get_users, schemas.UserResponse)
+    measure("patients: eager-joined (old)", Session,
+            lambda db: db.query(models.Patient).options(joinedload(models.Patient.alerts_patient)).all(),
+            schemas.PatientResponse)
+    measure("patients: projection (new)", Session, crud.get_patients, schemas.PatientResponse)
+
+
+if __name__ == "__main__":
+    main()
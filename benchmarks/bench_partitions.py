@@ -0,0 +1,131 @@
+# benchmarks/bench_partitions.py
+"""
+Monthly access-log partitions: windowed read latency with everything in one
+access_logs table versus after sealing old months into partitions, and how
+long writers are held up while old data moves out (partitions.seal, then
+retention) compared with one bulk DELETE of the same rows.
+
+    python -m benchmarks.bench_partitions --months 12 --rows-per-month 100000
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+from fastapi import Response
+from sqlalchemy import delete
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._common import populate, temp_sqlite_engine, timeit
+import crud
+import models
+import partitions
+import schemas
+from migrations import run_migrations
+from routers.exports import iter_anonymized_logs
+from routers.metrics import get_logs, metrics_overview
+
+
+def seed_months(engine, months: int, per_month: int, now: datetime):
+    """About `per_month` logs for each of the last `months` calendar months (the current one partial)."""
+    first = partitions.add_months(partitions.month_start(now), 1 - months)
+    populate(engine, users=200, patients=5000, logs=months * per_month, alerts=months * per_month // 20,
+             days=(now - first).total_seconds() / 86400, seed=19, now=now)
+
+
+def read_timings(Session, day_minutes: int = 1440, quarter_minutes: int = 90 * 1440) -> dict:
+    def call(fn):
+        db = Session()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+
+    def logs(since, **filters):
+        return lambda db: get_logs(Response(), db, limit=100, user_id=filters.get("user_id"), patient_id=None,
+                                   action=None, since_minutes=since, cursor=None)
+
+    since = datetime.utcnow() - timedelta(minutes=day_minutes)
+    return {
+        "/logs 1 day": timeit(lambda: call(logs(day_minutes))),
+        "/logs 90 days, user": timeit(lambda: call(logs(quarter_minutes, user_id=7))),
+        "/metrics/overview 90 d": timeit(lambda: call(lambda db: metrics_overview(db=db, since_minutes=quarter_minutes))),
+        "export 1 day": timeit(lambda: sum(len(c) for c in iter_anonymized_logs(since, Session)), repeat=3),
+    }
+
+
+class WriterProbe:
+    """Writes an access log every few ms and records the worst commit latency."""
+
+    def __init__(self, Session):
+        self.Session = Session
+        self.worst = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+
+    def _run(self):
+        data = schemas.AccessLogBase(user_id=1, patient_id=1, action="view")
+        while not self._stop.is_set():
+            db = self.Session()
+            start = time.perf_counter()
+            crud.log_access(db, data, authorized=True)
+            self.worst = max(self.worst, (time.perf_counter() - start) * 1000)
+            db.close()
+            time.sleep(0.005)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--rows-per-month", type=int, default=100_000)
+    parser.add_argument("--retention-months", type=int, default=6)
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    engine = temp_sqlite_engine()
+    run_migrations(engine)
+    seed_months(engine, args.months, args.rows_per_month, now)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    print(f"{args.months} months x {args.rows_per_month} rows\n")
+
+    single = read_timings(Session)
+    with WriterProbe(Session) as probe:
+        start = time.perf_counter()
+        sealed = partitions.seal(engine)
+        seal_s = time.perf_counter() - start
+    sealed_reads = read_timings(Session)
+
+    print(f"{'query (median ms)':<24} {'one table':>10} {'partitioned':>12}")
+    for name in single:
+        print(f"{name:<24} {single[name]:10.2f} {sealed_reads[name]:12.2f}")
+
+    print(f"\nseal {len(sealed)} months: {seal_s:.1f} s, worst concurrent write {probe.worst:.0f} ms")
+    with WriterProbe(Session) as probe:
+        start = time.perf_counter()
+        retired = partitions.enforce_retention(engine, months=args.retention_months, drop_delay=0)
+        retire_s = time.perf_counter() - start
+    print(f"retention drop {len(retired)} months: {retire_s:.2f} s, worst concurrent write {probe.worst:.0f} ms")
+
+    # Baseline: expire the same amount of history from a single table with one DELETE.
+    baseline = temp_sqlite_engine()
+    run_migrations(baseline)
+    seed_months(baseline, args.months, args.rows_per_month, now)
+    horizon = partitions.add_months(partitions.month_start(now), -args.retention_months)
+    with WriterProbe(sessionmaker(bind=baseline)) as probe:
+        start = time.perf_counter()
+        with baseline.begin() as conn:
+            conn.execute(delete(models.AccessLog).where(models.AccessLog.timestamp < horizon))
+        delete_s = time.perf_counter() - start
+    print(f"single-table DELETE of the same months: {delete_s:.2f} s, worst concurrent write {probe.worst:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_reports.py
+"""
+Audit reports per second when rendering N reports in parallel on a thread
+pool (report_render.render_audit_report, one session per report).
+
+    python -m benchmarks.bench_reports --reports 32 --threads 1 2 4 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._common import populate, temp_sqlite_engine
+from database import Base
+from report_render import render_audit_report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reports", type=int, default=32)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--logs", type=int, default=50_000)
+    args = parser.parse_args()
+
+    engine = temp_sqlite_engine()
+    Base.metadata.create_all(bind=engine)
+    populate(engine, users=50, patients=500, logs=args.logs, alerts=100, seed=5)
+    Session = sessionmaker(bind=engine)
+
+    def one(i):
+        db = Session()
+        try:
+            # alternate windows so concurrent renders draw different charts
+            return len(render_audit_report(db, 1440 if i % 2 else 720))
+        finally:
+            db.close()
+
+    one(0)  # warm imports and font caches
+    print(f"{args.reports} reports per run\n")
+    for threads in args.threads:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            sizes = list(pool.map(one, range(args.reports)))
+        elapsed = time.perf_counter() - start
+        assert all(sizes)
+        print(f"threads={threads:<3} {elapsed:7.2f} s  {args.reports / elapsed:6.2f} reports/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_startup.py
+"""
+API cold-start cost: import-time budget, time-to-first-request and RSS of a
+single uvicorn worker, before and after the first report pulls in the lazy
+plotting stack.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget-ms 1500 --skip-server
+
+Exits non-zero when `import main` exceeds the budget or loads any module in
+HEAVY_MODULES, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("matplotlib", "reportlab", "pandas", "numpy", "PIL", "xlsxwriter", "pyarrow")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": elapsed, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _env():
+    env = dict(os.environ, PYTHONPATH=ROOT, REPORT_PREGENERATE="0")
+    env.pop("PYTHONWARNINGS", None)
+    return env
+
+
+def rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def import_budget(cwd: str, budget_ms: float) -> bool:
+    samples = []
+    for _ in range(3):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", IMPORT_PROBE], cwd=cwd, env=_env(),
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    best = min(s["ms"] for s in samples)
+    heavy = samples[0]["heavy"]
+    ok = best <= budget_ms and not heavy
+    print(f"import main: {best:.0f} ms (budget {budget_ms:.0f} ms), heavy modules loaded: {heavy or 'none'}"
+          f"  -> {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str, timeout: float = 60):
+    with urllib.request.urlopen(url, timeout=timeout) as r:
+        return r.status, r.read()
+
+
+def server_startup(cwd: str):
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during start-up")
+            try:
+                _get(f"{base}/health", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.02)
+        ttfr = time.perf_counter() - start
+        print(f"time to first request: {ttfr * 1000:.0f} ms")
+        print(f"RSS after start-up:    {rss_mb(proc.pid) or float('nan'):.1f} MB")
+
+        start = time.perf_counter()
+        _get(f"{base}/reports/audit")
+        print(f"first /reports/audit:  {(time.perf_counter() - start) * 1000:.0f} ms (loads plotting stack)")
+        print(f"RSS after first report: {rss_mb(proc.pid) or float('nan'):.1f} MB")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--skip-server", action="store_true")
+    args = parser.parse_args()
+
+    cwd = tempfile.mkdtemp(prefix="phipa-startup-")  # throwaway ./privacy_governance.db
+    ok = import_budget(cwd, args.budget_ms)
+    if not args.skip_server:
+        server_startup(cwd)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# bulk_ingest.py
+"""
+Bulk loading of users, patients and consents.
+
+Rows arrive as a JSON array or a streamed CSV body (Content-Type: text/csv,
+header row required). Each row is validated with the resource's pydantic
+Create schema and checked for conflicts (duplicate emails / record ids,
+unknown users or patients, existing consent pairs). Valid rows are inserted
+with chunked executemany inside a single transaction; rejected rows are
+reported by their 0-based position in the input.
+
+CSV bodies are parsed as they stream in and each BULK_CHUNK_SIZE rows are
+checked and inserted as soon as they have arrived, so memory stays at about
+one chunk whatever the upload size. The transaction stays open until the
+last chunk, which on SQLite holds the write lock for the whole upload.
+"""
+import codecs
+import csv
+from collections import deque
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+import models, schemas
+import consent_cache
+from consent_index import index as consent_index
+
+BULK_CHUNK_SIZE = 1000
+
+
+# ---------------- Request parsing ----------------
+class _Lines:
+    """Line source for csv.reader that is refilled between reads."""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _csv_rows(request: Request):
+    """
+    Yield the CSV body's rows as dicts while it streams in. Lines are split on
+    "\n" only, and a line is handed to the csv reader only once its record is
+    complete (an even number of quote characters so far), so quoted fields may
+    contain newlines or any other character.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    source = _Lines()
+    reader = csv.DictReader(source)
+    pending = ""  # text after the last "\n"
+    record, quotes = [], 0  # lines of the record in progress
+
+    def feed(text: str):
+        nonlocal record, quotes
+        for line in text.split("\n")[:-1]:
+            record.append(line + "\n")
+            quotes += line.count('"')
+            if quotes % 2 == 0:
+                source.lines.extend(record)
+                record, quotes = [], 0
+
+    async for chunk in request.stream():
+        text = pending + decoder.decode(chunk)
+        cut = text.rfind("\n") + 1
+        feed(text[:cut])
+        pending = text[cut:]
+        for row in reader:
+            yield row
+    pending += decoder.decode(b"", final=True)
+    source.lines.extend(record)
+    if pending:
+        source.lines.append(pending)
+    for row in reader:
+        yield row
+
+
+# ---------------- Conflict checks (per chunk) ----------------
+def _user_conflicts(db, chunk, seen):
+    emails = [u.email for _, u in chunk]
+    existing = {e for (e,) in db.query(models.User.email).filter(models.User.email.in_(emails))}
+    conflicts = {}
+    for idx, u in chunk:
+        if u.email in existing or u.email in seen:
+            conflicts[idx] = f"User with email {u.email} already exists."
+        seen.add(u.email)
+    return conflicts
+
+
+def _patient_conflicts(db, chunk, seen):
+    record_ids = [p.record_id for _, p in chunk]
+    existing = {r for (r,) in db.query(models.Patient.record_id).filter(models.Patient.record_id.in_(record_ids))}
+    conflicts = {}
+    for idx, p in chunk:
+        if p.record_id in existing or p.record_id in seen:
+            conflicts[idx] = f"Patient with record_id {p.record_id} already exists."
+        seen.add(p.record_id)
+    return conflicts
+
+
+def _consent_conflicts(db, chunk, seen):
+    user_ids = {c.user_id for _, c in chunk}
+    patient_ids = {c.patient_id for _, c in chunk}
+    known_users = {i for (i,) in db.query(models.User.id).filter(models.User.id.in_(user_ids))}
+    known_patients = {i for (i,) in db.query(models.Patient.id).filter(models.Patient.id.in_(patient_ids))}
+    pairs = {(c.user_id, c.patient_id) for _, c in chunk}
+    existing = set(db.query(models.Consent.user_id, models.Consent.patient_id).filter(
+        consent_cache.consent_pairs_filter(db, pairs)
+    ).all())
+    conflicts = {}
+    for idx, c in chunk:
+        pair = (c.user_id, c.patient_id)
+        if c.user_id not in known_users:
+            conflicts[idx] = f"User {c.user_id} does not exist."
+        elif c.patient_id not in known_patients:
+            conflicts[idx] = f"Patient {c.patient_id} does not exist."
+        elif pair in existing or pair in seen:
+            conflicts[idx] = f"Consent for user {c.user_id} and patient {c.patient_id} already exists."
+        seen.add(pair)
+    return conflicts
+
+
+def _after_consents(db, inserted):
+    for c in inserted:
+        consent_cache.invalidate_consent(c["user_id"], c["patient_id"])
+    consent_index.apply_grants(inserted)
+
+
+RESOURCES = {
+    "users": (models.User, schemas.UserCreate, _user_conflicts, None),
+    "patients": (models.Patient, schemas.PatientCreate, _patient_conflicts, None),
+    "consents": (models.Consent, schemas.ConsentCreate, _consent_conflicts, _after_consents),
+}
+
+
+# ---------------- Ingestion ----------------
+class BulkIngest:
+    """One bulk load, fed a chunk of rows at a time and committed by finish()."""
+
+    def __init__(self, db, resource: str):
+        self.db = db
+        self.model, self.schema, self.find_conflicts, self.after_commit = RESOURCES[resource]
+        self.received = 0
+        self.conflicts = []
+        self.inserted = 0
+        self.committed_rows = []  # kept only for after_commit
+        self.seen = set()
+
+    def add(self, rows: list):
+        """Validate, conflict-check and insert the next chunk of rows."""
+        chunk = []
+        for idx, raw in enumerate(rows, start=self.received):
+            try:
+                chunk.append((idx, self.schema.model_validate(raw)))
+            except ValidationError as e:
+                err = e.errors(include_url=False)[0]
+                field = ".".join(str(part) for part in err["loc"])
+                self.conflicts.append({"row": idx, "error": f"{field}: {err['msg']}" if field else err["msg"]})
+        self.received += len(rows)
+
+        rejected = self.find_conflicts(self.db, chunk, self.seen) if chunk else {}
+        values = []
+        for idx, item in chunk:
+            if idx in rejected:
+                self.conflicts.append({"row": idx, "error": rejected[idx]})
+            else:
+                values.append(item.model_dump())
+        if values:
+            self.db.execute(insert(self.model), values)
+            self.inserted += len(values)
+            if self.after_commit:
+                self.committed_rows.extend(values)
+
+    def finish(self) -> dict:
+        self.db.commit()
+        if self.after_commit and self.committed_rows:
+            self.after_commit(self.db, self.committed_rows)
+        self.conflicts.sort(key=lambda c: c["row"])
+        return {"received": self.received, "inserted": self.inserted, "conflicts": self.conflicts}
+
+
+def ingest(db, resource: str, rows: list, chunk_size: int = BULK_CHUNK_SIZE) -> dict:
+    job = BulkIngest(db, resource)
+    try:
+        for start in range(0, len(rows), chunk_size):
+            job.add(rows[start:start + chunk_size])
+        return job.finish()
+    except Exception:
+        db.rollback()
+        raise
+
+
+async def ingest_request(request: Request, db, resource: str, chunk_size: int = BULK_CHUNK_SIZE) -> dict:
+    """
+    Ingest the request body (JSON array or CSV). Database work runs in the
+    threadpool; CSV rows are ingested chunk by chunk as they arrive.
+    """
+    if not request.headers.get("content-type", "").startswith("text/csv"):
+        body = await request.json()
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of rows.")
+        return await run_in_threadpool(ingest, db, resource, body, chunk_size)
+
+    job = BulkIngest(db, resource)
+    try:
+        batch = []
+        async for row in _csv_rows(request):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                await run_in_threadpool(job.add, batch)
+                batch = []
+        if batch:
+            await run_in_threadpool(job.add, batch)
+        return await run_in_threadpool(job.finish)
+    except Exception:
+        await run_in_threadpool(db.rollback)
+        raise
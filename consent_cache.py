@@ -0,0 +1,231 @@
+# consent_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import and_, or_, tuple_
+
+import models
+
+CONSENT_CACHE_SIZE = int(os.getenv("CONSENT_CACHE_SIZE", "10000"))
+NAME_CACHE_SIZE = int(os.getenv("NAME_CACHE_SIZE", "10000"))
+# Upper bound on how long a cached consent decision is trusted (0 = no expiry).
+# Other workers' consent writes only reach this process through expiry.
+CONSENT_CACHE_TTL = float(os.getenv("CONSENT_CACHE_TTL", "300"))
+
+# Dialects that accept a row-value IN, e.g. (user_id, patient_id) IN ((1, 2), ...).
+ROW_VALUE_IN_DIALECTS = {"sqlite", "postgresql", "mysql", "mariadb", "oracle"}
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU with hit/miss/eviction counters and an optional TTL.
+
+    Readers that fill the cache from the database take a `token(key)` before
+    the query and pass it to `set`; `invalidate` bumps the key's generation,
+    so a value read before an invalidation is not written back afterwards.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._generations = {}  # key -> invalidation count
+        self._epoch = 0  # bumped when _generations is reset
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_writes = 0
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[1] is None or entry[1] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def token(self, key):
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key, value, token=None):
+        with self._lock:
+            if token is not None and token != (self._epoch, self._generations.get(key, 0)):
+                # Invalidated while the caller was reading: the value may be stale.
+                self.stale_writes += 1
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl if self.ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._generations) >= self.maxsize:
+                # Keep the table bounded; the new epoch voids every outstanding token.
+                self._generations.clear()
+                self._epoch += 1
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_writes": self.stale_writes,
+                "ttl": self.ttl,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# (user_id, patient_id) -> (can_view, can_edit), or None when no consent exists
+consents = LRUCache(CONSENT_CACHE_SIZE, ttl=CONSENT_CACHE_TTL)
+# user_id -> name, patient_id -> name
+user_names = LRUCache(NAME_CACHE_SIZE)
+patient_names = LRUCache(NAME_CACHE_SIZE)
+
+
+# ---------------- Consent decisions ----------------
+def consent_pairs_filter(db, pairs):
+    """WHERE clause matching exactly the given (user_id, patient_id) pairs."""
+    if db.get_bind().dialect.name in ROW_VALUE_IN_DIALECTS:
+        return tuple_(models.Consent.user_id, models.Consent.patient_id).in_(pairs)
+    return or_(*(and_(models.Consent.user_id == u, models.Consent.patient_id == p) for u, p in pairs))
+
+
+def get_consent(db, user_id: int, patient_id: int):
+    """Return (can_view, can_edit) for the pair, or None if no consent exists."""
+    key = (user_id, patient_id)
+    cached = consents.get(key)
+    if cached is not _MISSING:
+        return cached
+
+    token = consents.token(key)
+    row = db.query(models.Consent.can_view, models.Consent.can_edit).filter_by(
+        patient_id=patient_id, user_id=user_id
+    ).first()
+    value = (bool(row[0]), bool(row[1])) if row else None
+    consents.set(key, value, token)
+    return value
+
+
+def get_consents(db, pairs) -> dict:
+    """Batch form of get_consent: resolves every (user_id, patient_id) pair with
+    at most one query for the pairs not already cached."""
+    result = {}
+    missing = set()
+    for key in pairs:
+        cached = consents.get(key)
+        if cached is _MISSING:
+            missing.add(key)
+        else:
+            result[key] = cached
+
+    if missing:
+        tokens = {key: consents.token(key) for key in missing}
+        rows = db.query(
+            models.Consent.user_id, models.Consent.patient_id,
+            models.Consent.can_view, models.Consent.can_edit
+        ).filter(consent_pairs_filter(db, missing)).all()
+        found = {}
+        for user_id, patient_id, can_view, can_edit in rows:
+            # keep the first match, same as .first() in get_consent
+            found.setdefault((user_id, patient_id), (bool(can_view), bool(can_edit)))
+        for key in missing:
+            value = found.get(key)
+            consents.set(key, value, tokens[key])
+            result[key] = value
+    return result
+
+
+def invalidate_consent(user_id: int, patient_id: int):
+    """Drop a cached decision. Call after any consent write for the pair."""
+    consents.invalidate((user_id, patient_id))
+
+
+# ---------------- Display names ----------------
+def get_user_name(db, user_id: int) -> str:
+    name = user_names.get(user_id)
+    if name is not _MISSING:
+        return name
+    row = db.query(models.User.name).filter_by(id=user_id).first()
+    if not row:
+        # Don't cache misses: the user may be created later with this id.
+        return f"User #{user_id}"
+    user_names.set(user_id, row[0])
+    return row[0]
+
+
+def get_patient_name(db, patient_id: int) -> str:
+    name = patient_names.get(patient_id)
+    if name is not _MISSING:
+        return name
+    row = db.query(models.Patient.name).filter_by(id=patient_id).first()
+    if not row:
+        return f"Patient #{patient_id}"
+    patient_names.set(patient_id, row[0])
+    return row[0]
+
+
+def _get_names(db, cache, model, ids, fallback: str) -> dict:
+    result = {}
+    missing = set()
+    for i in ids:
+        name = cache.get(i)
+        if name is _MISSING:
+            missing.add(i)
+        else:
+            result[i] = name
+    if missing:
+        for i, name in db.query(model.id, model.name).filter(model.id.in_(missing)).all():
+            cache.set(i, name)
+            result[i] = name
+    for i in missing - result.keys():
+        result[i] = fallback.format(i)
+    return result
+
+
+def get_user_names(db, user_ids) -> dict:
+    return _get_names(db, user_names, models.User, user_ids, "User #{}")
+
+
+def get_patient_names(db, patient_ids) -> dict:
+    return _get_names(db, patient_names, models.Patient, patient_ids, "Patient #{}")
+
+
+def stats() -> dict:
+    return {
+        "consents": consents.stats(),
+        "user_names": user_names.stats(),
+        "patient_names": patient_names.stats(),
+    }
+
+
+def clear():
+    consents.clear()
+    user_names.clear()
+    patient_names.clear()
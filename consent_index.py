@@ -0,0 +1,198 @@
+# consent_index.py
+"""
+Compact in-memory index of consent grants.
+
+For each user there is a bitmap of patient ids they can view / edit, and for
+each patient a bitmap of user ids that can view / edit them, so "can X view
+Y", "who can view Y" and "what can X view" never touch the consents table.
+
+Bitmaps are Roaring-style: ids are split into 16-bit chunks; sparse chunks
+are sorted uint16 arrays and chunks with more than ARRAY_LIMIT members are
+converted to a 65536-bit integer bitmap.
+
+The index is built lazily from the consents table on first use and kept
+current by crud.create_consent (write-through). Like consent_cache, it is
+per process.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+
+import models
+
+ARRAY_LIMIT = 4096
+
+
+class Bitmap:
+    __slots__ = ("_chunks",)
+
+    def __init__(self):
+        self._chunks = {}
+
+    def add(self, value: int):
+        high, low = value >> 16, value & 0xFFFF
+        chunk = self._chunks.get(high)
+        if chunk is None:
+            self._chunks[high] = array("H", [low])
+        elif isinstance(chunk, int):
+            self._chunks[high] = chunk | (1 << low)
+        else:
+            i = bisect_left(chunk, low)
+            if i < len(chunk) and chunk[i] == low:
+                return
+            chunk.insert(i, low)
+            if len(chunk) > ARRAY_LIMIT:
+                bits = 0
+                for v in chunk:
+                    bits |= 1 << v
+                self._chunks[high] = bits
+
+    def discard(self, value: int):
+        high, low = value >> 16, value & 0xFFFF
+        chunk = self._chunks.get(high)
+        if chunk is None:
+            return
+        if isinstance(chunk, int):
+            chunk &= ~(1 << low)
+            if chunk:
+                self._chunks[high] = chunk
+            else:
+                del self._chunks[high]
+        else:
+            i = bisect_left(chunk, low)
+            if i < len(chunk) and chunk[i] == low:
+                del chunk[i]
+                if not chunk:
+                    del self._chunks[high]
+
+    def __contains__(self, value: int) -> bool:
+        chunk = self._chunks.get(value >> 16)
+        if chunk is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(chunk, int):
+            return bool(chunk >> low & 1)
+        i = bisect_left(chunk, low)
+        return i < len(chunk) and chunk[i] == low
+
+    def __iter__(self):
+        for high in sorted(self._chunks):
+            chunk = self._chunks[high]
+            base = high << 16
+            if isinstance(chunk, int):
+                while chunk:
+                    lowest = chunk & -chunk
+                    yield base + lowest.bit_length() - 1
+                    chunk ^= lowest
+            else:
+                for low in chunk:
+                    yield base + low
+
+    def __len__(self) -> int:
+        return sum(
+            c.bit_count() if isinstance(c, int) else len(c)
+            for c in self._chunks.values()
+        )
+
+    def nbytes(self) -> int:
+        """Approximate payload size (excluding Python object overhead)."""
+        return sum(
+            8192 if isinstance(c, int) else 2 * len(c)
+            for c in self._chunks.values()
+        )
+
+
+class ConsentIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        # permission -> {user_id: Bitmap(patient_ids)} and {patient_id: Bitmap(user_ids)}
+        self._by_user = {"view": {}, "edit": {}}
+        self._by_patient = {"view": {}, "edit": {}}
+
+    # ---------------- Maintenance ----------------
+    def _set(self, permission: str, user_id: int, patient_id: int, granted: bool):
+        by_user, by_patient = self._by_user[permission], self._by_patient[permission]
+        if granted:
+            by_user.setdefault(user_id, Bitmap()).add(patient_id)
+            by_patient.setdefault(patient_id, Bitmap()).add(user_id)
+        else:
+            if user_id in by_user:
+                by_user[user_id].discard(patient_id)
+            if patient_id in by_patient:
+                by_patient[patient_id].discard(user_id)
+
+    def load(self, db):
+        """(Re)build the index with one scan of the consents table."""
+        with self._lock:
+            self._by_user = {"view": {}, "edit": {}}
+            self._by_patient = {"view": {}, "edit": {}}
+            seen = set()
+            rows = db.query(
+                models.Consent.user_id, models.Consent.patient_id,
+                models.Consent.can_view, models.Consent.can_edit
+            ).order_by(models.Consent.id).execution_options(yield_per=10_000)
+            for user_id, patient_id, can_view, can_edit in rows:
+                # The first consent row for a pair is authoritative, as in access checks.
+                if (user_id, patient_id) in seen:
+                    continue
+                seen.add((user_id, patient_id))
+                self._set("view", user_id, patient_id, bool(can_view))
+                self._set("edit", user_id, patient_id, bool(can_edit))
+            self._loaded = True
+
+    def ensure_loaded(self, db):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load(db)
+
+    def refresh_pair(self, db, user_id: int, patient_id: int):
+        """Re-read the authoritative consent for one pair after a write."""
+        if not self._loaded:
+            return
+        row = db.query(models.Consent.can_view, models.Consent.can_edit).filter_by(
+            user_id=user_id, patient_id=patient_id
+        ).order_by(models.Consent.id).first()
+        with self._lock:
+            self._set("view", user_id, patient_id, bool(row and row[0]))
+            self._set("edit", user_id, patient_id, bool(row and row[1]))
+
+    def apply_grants(self, rows):
+        """Record freshly inserted consents for pairs that had no prior row."""
+        if not self._loaded:
+            return
+        with self._lock:
+            for row in rows:
+                self._set("view", row["user_id"], row["patient_id"], bool(row["can_view"]))
+                self._set("edit", row["user_id"], row["patient_id"], bool(row["can_edit"]))
+
+    # ---------------- Queries ----------------
+    def can(self, db, user_id: int, patient_id: int, permission: str = "view") -> bool:
+        self.ensure_loaded(db)
+        bitmap = self._by_user[permission].get(user_id)
+        return bitmap is not None and patient_id in bitmap
+
+    def users_for_patient(self, db, patient_id: int, permission: str = "view") -> list:
+        self.ensure_loaded(db)
+        return list(self._by_patient[permission].get(patient_id, ()))
+
+    def patients_for_user(self, db, user_id: int, permission: str = "view") -> list:
+        self.ensure_loaded(db)
+        return list(self._by_user[permission].get(user_id, ()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "grants": {p: sum(len(b) for b in m.values()) for p, m in self._by_user.items()},
+                "users": {p: len(m) for p, m in self._by_user.items()},
+                "patients": {p: len(m) for p, m in self._by_patient.items()},
+                "approx_bytes": sum(
+                    b.nbytes() for maps in (self._by_user, self._by_patient)
+                    for m in maps.values() for b in m.values()
+                ),
+            }
+
+
+index = ConsentIndex()
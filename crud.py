@@ -1,8 +1,44 @@
 # crud.py
+from sqlalchemy import func, insert, select, text
 from sqlalchemy.orm import Session
 import models, schemas
+import consent_cache
+from consent_index import index as consent_index
+import log_buffer
+import rollups
+from pagination import paginate_by_id
 from datetime import datetime
 
+# ---------------- Bulk inserts ----------------
+def insert_with_ids(db: Session, model, rows: list) -> list:
+    """
+    Insert `rows` as one executemany and return their new ids in input order.
+
+    Ordered RETURNING (sort_by_parameter_order) needs a sentinel column these
+    tables lack, and without one SQLAlchemy falls back to one INSERT per row.
+    On SQLite the open write transaction holds the database lock, so the
+    batch gets consecutive rowids ending at last_insert_rowid(). On Postgres
+    the ids are drawn from the sequence first and inserted explicitly.
+    """
+    if not rows:
+        return []
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        db.execute(insert(table), rows)
+        last = db.execute(select(func.last_insert_rowid())).scalar()
+        return list(range(last - len(rows) + 1, last + 1))
+    if dialect == "postgresql":
+        ids = sorted(db.execute(
+            text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :n)"),
+            {"table": table.name, "n": len(rows)}
+        ).scalars())
+        db.execute(insert(table), [dict(row, id=i) for row, i in zip(rows, ids)])
+        return ids
+    result = db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows)
+    return list(result.scalars())
+
+
 # ---------------- Users ----------------
 def create_user(db: Session, user: schemas.UserCreate):
     db_user = models.User(**user.dict())
@@ -11,8 +47,17 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
-def get_users(db: Session):
-    return db.query(models.User).all()
+def get_users(db: Session, search: str = None, role: str = None,
+              limit: int = None, cursor: str = None, response=None):
+    """Column-only projection of users; paginated by id when `limit` is given."""
+    q = db.query(models.User.id, models.User.name, models.User.role, models.User.email)
+    if search:
+        q = q.filter(models.User.name.ilike(f"%{search}%"))
+    if role:
+        q = q.filter(models.User.role == role)
+    if limit is None:
+        return q.order_by(models.User.id).all()
+    return paginate_by_id(q, models.User.id, limit, cursor, response)
 
 
 # ---------------- Patients ----------------
@@ -23,8 +68,15 @@ def create_patient(db: Session, patient: schemas.PatientCreate):
     db.refresh(db_patient)
     return db_patient
 
-def get_patients(db: Session):
-    return db.query(models.Patient).all()
+def get_patients(db: Session, search: str = None,
+                 limit: int = None, cursor: str = None, response=None):
+    """Column-only projection of patients; paginated by id when `limit` is given."""
+    q = db.query(models.Patient.id, models.Patient.name, models.Patient.dob, models.Patient.record_id)
+    if search:
+        q = q.filter(models.Patient.name.ilike(f"%{search}%"))
+    if limit is None:
+        return q.order_by(models.Patient.id).all()
+    return paginate_by_id(q, models.Patient.id, limit, cursor, response)
 
 
 # ---------------- Consents ----------------
@@ -33,6 +85,8 @@ def create_consent(db: Session, consent: schemas.ConsentCreate):
     db.add(db_consent)
     db.commit()
     db.refresh(db_consent)
+    consent_cache.invalidate_consent(db_consent.user_id, db_consent.patient_id)
+    consent_index.refresh_pair(db, db_consent.user_id, db_consent.patient_id)
     return db_consent
 
 def get_consents(db: Session):
@@ -40,15 +94,53 @@ def get_consents(db: Session):
 
 
 # ---------------- Access Logs ----------------
-def log_access(db: Session, log_data: schemas.AccessLogBase, authorized: bool):
-    log = models.AccessLog(
-        user_id=log_data.user_id,
-        patient_id=log_data.patient_id,
-        action=log_data.action,
-        is_authorized=authorized,
-        timestamp=datetime.utcnow()
-    )
+def log_access(db: Session, log_data: schemas.AccessLogBase, authorized: bool, wait: bool = True):
+    """
+    Record one access check. With wait=False (async handlers) a full log
+    buffer is not waited on; the row is written through `db` instead.
+    """
+    row = {
+        "user_id": log_data.user_id,
+        "patient_id": log_data.patient_id,
+        "action": log_data.action,
+        "is_authorized": authorized,
+        "timestamp": datetime.utcnow(),
+    }
+    if log_buffer.enabled() and authorized:
+        # Group commit: the flusher thread persists the row within the loss window.
+        # Denials are written synchronously so the alert can reference the row.
+        if wait:
+            log_buffer.buffer.submit(row)
+            return models.AccessLog(**row)
+        if log_buffer.buffer.offer(row):
+            return models.AccessLog(**row)
+
+    log = models.AccessLog(**row)
     db.add(log)
+    rollups.record(db, [row])
     db.commit()
     db.refresh(log)
     return log
+
+def log_access_many(db: Session, entries, commit: bool = True):
+    """
+    Insert many (log_data, authorized) pairs with a single executemany.
+    Returns the new row ids in input order.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": log_data.user_id,
+            "patient_id": log_data.patient_id,
+            "action": log_data.action,
+            "is_authorized": authorized,
+            "timestamp": now,
+        }
+        for log_data, authorized in entries
+    ]
+    ids = insert_with_ids(db, models.AccessLog, rows)
+    if rows:
+        rollups.record(db, rows)
+    if commit:
+        db.commit()
+    return ids
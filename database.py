@@ -1,19 +1,138 @@
 # database.py
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = "sqlite:///./privacy_governance.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./privacy_governance.db")
+
+# Async drivers for the async request path; derived from DATABASE_URL unless set.
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+_sync_url = make_url(DATABASE_URL)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _sync_url.set(
+    drivername=ASYNC_DRIVERS.get(_sync_url.drivername, _sync_url.drivername)
+).render_as_string(hide_password=False)
+# Opt-in: serve the hot endpoints (POST /access/, /logs, /alerts,
+# /metrics/overview) from their async implementations. Off by default since
+# benchmarks/bench_async.py shows no throughput gain and a worse p99 on SQLite.
+ASYNC_ENDPOINTS = os.getenv("ASYNC_ENDPOINTS", "0") == "1"
+
+# Pool sizing. Ignored for in-memory SQLite, where SQLAlchemy keeps one
+# connection per thread (SingletonThreadPool; StaticPool for aiosqlite).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite tuning, applied to every new connection. WAL lets dashboard readers
+# run alongside the single writer instead of blocking on it.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# cache_size is per connection, and each engine may open up to
+# DB_POOL_SIZE + DB_MAX_OVERFLOW of them (two engines with ASYNC_ENDPOINTS=1).
+# By default SQLITE_CACHE_BUDGET_MB is split across that maximum, never going
+# below SQLite's stock 2 MiB; an explicit SQLITE_CACHE_SIZE (negative = KiB)
+# applies to every connection as-is.
+SQLITE_CACHE_BUDGET_MB = int(os.getenv("SQLITE_CACHE_BUDGET_MB", "256"))
+_MAX_CONNECTIONS = (DB_POOL_SIZE + DB_MAX_OVERFLOW) * (2 if ASYNC_ENDPOINTS else 1)
+SQLITE_CACHE_SIZE = int(os.getenv(
+    "SQLITE_CACHE_SIZE", str(-max(2048, SQLITE_CACHE_BUDGET_MB * 1024 // _MAX_CONNECTIONS))
+))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _sqlite_pragmas(pragmas: dict):
+    def on_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return on_connect
+
+
+def _configure(url: str, sqlite_pragmas, kwargs, create):
+    is_sqlite = url.startswith("sqlite")
+    in_memory = is_sqlite and (make_url(url).database in (None, "", ":memory:") or "mode=memory" in url)
+    options = {}
+    if is_sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+    if not in_memory:
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=not is_sqlite)
+    options.update(kwargs)
+    new_engine = create(url, **options)
+
+    if is_sqlite:
+        if sqlite_pragmas is None:
+            sqlite_pragmas = {
+                "journal_mode": SQLITE_JOURNAL_MODE,
+                "synchronous": SQLITE_SYNCHRONOUS,
+                "mmap_size": SQLITE_MMAP_SIZE,
+                "cache_size": SQLITE_CACHE_SIZE,
+                "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+            }
+            if in_memory:
+                sqlite_pragmas.pop("journal_mode")
+        if sqlite_pragmas:
+            sync_engine = getattr(new_engine, "sync_engine", new_engine)
+            event.listen(sync_engine, "connect", _sqlite_pragmas(sqlite_pragmas))
+    return new_engine
+
+
+def make_engine(url: str = DATABASE_URL, sqlite_pragmas: dict = None, **kwargs):
+    """Create an engine with the configured pool and, for SQLite, per-connection pragmas.
+
+    `sqlite_pragmas` overrides the defaults; pass {} for SQLite's stock settings.
+    """
+    return _configure(url, sqlite_pragmas, kwargs, create_engine)
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def make_async_engine(url: str = ASYNC_DATABASE_URL, sqlite_pragmas: dict = None, **kwargs):
+    """Async counterpart of make_engine (aiosqlite / asyncpg), same pool and pragmas."""
+    return _configure(url, sqlite_pragmas, kwargs, create_async_engine)
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# The async engine is built on first use, so unless ASYNC_ENDPOINTS=1 the
+# async driver (asyncpg for Postgres) is never needed.
+_async_engine = None
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = make_async_engine()
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
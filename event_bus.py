@@ -0,0 +1,169 @@
+# event_bus.py
+"""
+In-process broadcast bus behind the live feed (routers/live.py).
+
+Publishers (access checks, alert persistence, alert resolution) call
+`publish` from any thread; it never blocks and costs next to nothing when
+nobody is subscribed. Each subscriber has its own filters (user, patient,
+action, event kinds) and a bounded buffer of FEED_BUFFER_SIZE events. A
+subscriber whose buffer fills up is dropped, and its stream ends with a
+`dropped` event, so a slow consumer can never back up the API.
+
+Subscribers also keep counter deltas (authorized, breaches, alerts opened /
+resolved) for the events matching their filters; the stream flushes them as
+`metrics` events every FEED_METRICS_SECONDS.
+
+Event ids: `alert` and `alert_resolved` always carry the alert `id`.
+`access` carries the access log `id` once the row is inserted, so it is
+absent for granted checks queued by the log buffer (ACCESS_LOG_MODE=buffered)
+-- tail /logs with after_id when every id is needed.
+
+Like consent_cache, the bus is per process: with several API workers a
+client sees the events handled by the worker it is connected to.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+from collections import Counter, deque
+
+from fastapi.encoders import jsonable_encoder
+
+FEED_BUFFER_SIZE = int(os.getenv("FEED_BUFFER_SIZE", "1000"))
+FEED_MAX_SUBSCRIBERS = int(os.getenv("FEED_MAX_SUBSCRIBERS", "1000"))
+FEED_METRICS_SECONDS = float(os.getenv("FEED_METRICS_SECONDS", "1"))
+FEED_HEARTBEAT_SECONDS = float(os.getenv("FEED_HEARTBEAT_SECONDS", "15"))
+
+KINDS = ("access", "alert", "alert_resolved", "metrics")
+_DELTA_KEYS = {"alert": "alerts_opened", "alert_resolved": "alerts_resolved"}
+
+
+class Subscriber:
+    def __init__(self, loop, user_id: int = None, patient_id: int = None, action: str = None,
+                 kinds=KINDS, maxsize: int = FEED_BUFFER_SIZE):
+        self.id = None
+        self.user_id = user_id
+        self.patient_id = patient_id
+        self.action = action
+        self.kinds = frozenset(kinds)
+        self.maxsize = maxsize
+        self.dropped = False
+        self.delivered = 0
+        self._loop = loop
+        self._events = deque()
+        self._deltas = Counter()
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def matches(self, data: dict) -> bool:
+        # The action filter only applies to events that carry one (alerts do not).
+        return (
+            (self.user_id is None or data.get("user_id") == self.user_id)
+            and (self.patient_id is None or data.get("patient_id") == self.patient_id)
+            and (self.action is None or data.get("action", self.action) == self.action)
+        )
+
+    def offer(self, event: dict):
+        """Buffer an event if it matches. Called from any thread; never blocks."""
+        kind, data = event["event"], event["data"]
+        if not self.matches(data):
+            return
+        with self._lock:
+            if self.dropped:
+                return
+            if kind == "access":
+                self._deltas["authorized" if data["authorized"] else "breaches"] += 1
+            else:
+                self._deltas[_DELTA_KEYS[kind]] += 1
+            if kind not in self.kinds:
+                return
+            if len(self._events) >= self.maxsize:
+                self.dropped = True
+                self._events.clear()
+            else:
+                self._events.append(event)
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            pass  # the subscriber's event loop has shut down
+
+    async def next_batch(self, timeout: float) -> list:
+        """Wait up to `timeout` seconds for events and return everything buffered."""
+        if not self._events and not self.dropped:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._ready.clear()
+        with self._lock:
+            batch = list(self._events)
+            self._events.clear()
+        self.delivered += len(batch)
+        return batch
+
+    def take_deltas(self) -> dict:
+        with self._lock:
+            deltas = dict(self._deltas)
+            self._deltas.clear()
+        return deltas
+
+
+class EventBus:
+    def __init__(self, max_subscribers: int = FEED_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._sub_ids = itertools.count(1)
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def subscribe(self, **filters):
+        """Register a subscriber on the running event loop. Returns None when at capacity."""
+        sub = Subscriber(asyncio.get_running_loop(), **filters)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            sub.id = next(self._sub_ids)
+            self._subscribers[sub.id] = sub
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            if self._subscribers.pop(sub.id, None) is not None and sub.dropped:
+                self.dropped_subscribers += 1
+
+    def publish(self, kind: str, data: dict):
+        with self._lock:
+            self.published += 1
+            if not self._subscribers:
+                return
+            subscribers = list(self._subscribers.values())
+            seq = next(self._seq)
+        data = jsonable_encoder(data)
+        event = {"id": seq, "event": kind, "data": data, "json": json.dumps(data)}
+        for sub in subscribers:
+            sub.offer(event)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        return {
+            "subscribers": len(subscribers),
+            "max_subscribers": self.max_subscribers,
+            "buffer_size": FEED_BUFFER_SIZE,
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+            "buffered": sum(len(s._events) for s in subscribers),
+        }
+
+
+bus = EventBus()
+
+
+def publish(kind: str, data: dict):
+    bus.publish(kind, data)
@@ -0,0 +1,221 @@
+# instrumentation.py
+"""
+Request and database instrumentation, exposed in Prometheus text format at
+/metrics/prometheus (routers/metrics.py).
+
+MetricsMiddleware is a plain ASGI middleware: per route template and method
+it keeps a latency histogram, a request counter by status and an in-flight
+gauge. The template ("/alerts/{alert_id}/resolve", not the raw path, so
+label cardinality stays bounded) is read from scope["route"], which routing
+fills in; requests that match no route are labelled "(unmatched)".
+
+Engine event listeners (instrument_engine) count statements and cursor
+time, charged to the route of the request that issued them, or to
+"(background)" for the worker threads (log buffer, alert dispatcher,
+partition maintenance). The request's accumulator travels in a contextvar,
+which reaches sync endpoints in the threadpool and async ones through
+run_sync.
+
+Everything lives in process memory behind one lock; a request costs a few
+dict updates. Each worker exposes its own numbers, so scrape every worker.
+Set METRICS_ENABLED=0 to skip the middleware and the listeners entirely.
+"""
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+BACKGROUND = "(background)"
+UNMATCHED = "(unmatched)"
+
+# [scope, statements, db seconds] of the request being served.
+_current = ContextVar("instrumentation_request", default=None)
+
+
+def route_label(scope) -> str:
+    return getattr(scope.get("route"), "path", None) or UNMATCHED
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+def _labels(**labels) -> str:
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (method, route, status) -> count
+        self.latency = {}  # (method, route) -> Histogram
+        self.active = {}  # id(request state) -> scope, for the in-flight gauge
+        self.request_statements = {}  # (method, route) -> Histogram of statements per request
+        self.request_db_seconds = {}  # (method, route) -> Histogram of cursor time per request
+        self.db_statements = {}  # route -> count
+        self.db_seconds = {}  # route -> seconds
+        self.pools = {}  # engine name -> pool
+
+    # ---------------- Recording ----------------
+    def request_started(self, state):
+        with self._lock:
+            self.active[id(state)] = state[0]
+
+    def request_finished(self, state, status: int, seconds: float):
+        scope, statements, db_seconds = state
+        key = (scope["method"], route_label(scope))
+        with self._lock:
+            del self.active[id(state)]
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+            hist = self.latency.get(key)
+            if hist is None:
+                hist = self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.request_statements[key] = Histogram(STATEMENT_BUCKETS)
+                self.request_db_seconds[key] = Histogram(LATENCY_BUCKETS)
+            hist.observe(seconds)
+            self.request_statements[key].observe(statements)
+            self.request_db_seconds[key].observe(db_seconds)
+
+    def statement(self, route: str, seconds: float):
+        with self._lock:
+            self.db_statements[route] = self.db_statements.get(route, 0) + 1
+            self.db_seconds[route] = self.db_seconds.get(route, 0.0) + seconds
+
+    # ---------------- Exposition ----------------
+    def render(self) -> str:
+        with self._lock:
+            requests = dict(self.requests)
+            latency = {k: (list(h.counts), h.sum) for k, h in self.latency.items()}
+            statements = {k: (list(h.counts), h.sum) for k, h in self.request_statements.items()}
+            request_db_seconds = {k: (list(h.counts), h.sum) for k, h in self.request_db_seconds.items()}
+            active = list(self.active.values())
+            db_statements = dict(self.db_statements)
+            db_seconds = dict(self.db_seconds)
+
+        out = []
+
+        def header(name, kind, help_text):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, buckets, series):
+            for (method, route), (counts, total) in sorted(series.items()):
+                cumulative = 0
+                for bound, n in zip(list(buckets) + ["+Inf"], counts):
+                    cumulative += n
+                    out.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+                out.append(f"{name}_sum{_labels(method=method, route=route)} {total}")
+                out.append(f"{name}_count{_labels(method=method, route=route)} {cumulative}")
+
+        header("http_requests_total", "counter", "HTTP requests by route template, method and status.")
+        for (method, route, status), n in sorted(requests.items()):
+            out.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {n}")
+        header("http_request_duration_seconds", "histogram", "Request latency, until the response body is sent.")
+        histogram("http_request_duration_seconds", LATENCY_BUCKETS, latency)
+        header("http_requests_in_progress", "gauge", "Requests currently being served (open streams included).")
+        in_flight = {key: 0 for key in latency}
+        for scope in active:
+            key = (scope["method"], route_label(scope))
+            in_flight[key] = in_flight.get(key, 0) + 1
+        for (method, route), n in sorted(in_flight.items()):
+            out.append(f"http_requests_in_progress{_labels(method=method, route=route)} {n}")
+        header("http_request_db_statements", "histogram", "SQL statements issued per request.")
+        histogram("http_request_db_statements", STATEMENT_BUCKETS, statements)
+        header("http_request_db_seconds", "histogram", "Time spent executing SQL statements per request.")
+        histogram("http_request_db_seconds", LATENCY_BUCKETS, request_db_seconds)
+        header("db_statements_total", "counter", "SQL statements executed, by the route that issued them.")
+        for route, n in sorted(db_statements.items()):
+            out.append(f"db_statements_total{_labels(route=route)} {n}")
+        header("db_statement_seconds_total", "counter", "Time spent executing SQL statements, by route.")
+        for route, s in sorted(db_seconds.items()):
+            out.append(f"db_statement_seconds_total{_labels(route=route)} {s}")
+
+        header("db_pool_connections_in_use", "gauge", "Connections checked out of each engine's pool.")
+        for name, pool in sorted(self.pools.items()):
+            checked_out = getattr(pool, "checkedout", None)
+            if checked_out is not None:
+                out.append(f"db_pool_connections_in_use{_labels(engine=name)} {checked_out()}")
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+
+# ---------------- HTTP ----------------
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses pass through untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        state = [scope, 0, 0.0]
+        token = _current.set(state)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.request_started(state)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.request_finished(state, status, time.perf_counter() - start)
+            _current.reset(token)
+
+
+# ---------------- Database ----------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._instrumentation_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._instrumentation_start
+    state = _current.get()
+    if state is None:
+        registry.statement(BACKGROUND, seconds)
+        return
+    state[1] += 1
+    state[2] += seconds
+    registry.statement(route_label(state[0]), seconds)
+
+
+def instrument_engine(engine, name: str = "sync"):
+    """Count statements and cursor time on a (sync) Engine and report its pool usage."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    registry.pools[name] = engine.pool
+
+
+def instrument(app, engines: dict):
+    """Install the middleware and engine listeners unless METRICS_ENABLED=0."""
+    if not METRICS_ENABLED:
+        return
+    app.add_middleware(MetricsMiddleware)
+    for name, engine in engines.items():
+        instrument_engine(engine, name)
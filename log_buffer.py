@@ -0,0 +1,209 @@
+# log_buffer.py
+"""
+Opt-in group-commit buffer for access log rows.
+
+With ACCESS_LOG_MODE=buffered, crud.log_access enqueues granted-access rows
+here instead of committing each one (denials stay synchronous so their alert
+can reference the row). A background thread inserts them in batches of up to
+ACCESS_LOG_BATCH_SIZE rows, committing a partial batch ACCESS_LOG_FLUSH_MS
+after its first row.
+
+The data-loss window on a crash is everything still queued, not just
+ACCESS_LOG_FLUSH_MS: when rows arrive faster than one batch per flush the
+queue grows up to ACCESS_LOG_QUEUE_SIZE rows, which take
+ACCESS_LOG_QUEUE_SIZE / ACCESS_LOG_BATCH_SIZE back-to-back flushes to drain.
+stats() (GET /logs/buffer/stats) reports the queued rows and the age of the
+oldest. When the queue is full, producers wait up to
+ACCESS_LOG_ENQUEUE_TIMEOUT seconds and then fall back to a synchronous write.
+
+ACCESS_LOG_MAX_AGE_MS bounds the window in time as well: while the oldest
+queued row is older than that, new rows are written synchronously instead of
+queued, so the backlog stops growing until the flusher has caught up.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+import models
+import rollups
+from database import SessionLocal
+
+ACCESS_LOG_MODE = os.getenv("ACCESS_LOG_MODE", "sync")
+ACCESS_LOG_BATCH_SIZE = int(os.getenv("ACCESS_LOG_BATCH_SIZE", "500"))
+ACCESS_LOG_FLUSH_MS = int(os.getenv("ACCESS_LOG_FLUSH_MS", "50"))
+ACCESS_LOG_QUEUE_SIZE = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", "10000"))
+ACCESS_LOG_ENQUEUE_TIMEOUT = float(os.getenv("ACCESS_LOG_ENQUEUE_TIMEOUT", "1.0"))
+ACCESS_LOG_MAX_AGE_MS = int(os.getenv("ACCESS_LOG_MAX_AGE_MS", "1000"))  # 0 = no time bound
+
+
+class AccessLogBuffer:
+    def __init__(self, batch_size: int = ACCESS_LOG_BATCH_SIZE,
+                 flush_ms: int = ACCESS_LOG_FLUSH_MS,
+                 queue_size: int = ACCESS_LOG_QUEUE_SIZE,
+                 enqueue_timeout: float = ACCESS_LOG_ENQUEUE_TIMEOUT,
+                 max_age_ms: int = ACCESS_LOG_MAX_AGE_MS,
+                 session_factory=SessionLocal):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self.enqueue_timeout = enqueue_timeout
+        self.max_age_ms = max_age_ms
+        self.session_factory = session_factory
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.sync_fallbacks = 0
+        self.age_fallbacks = 0
+        self.failed_rows = 0
+
+    # ---------------- Lifecycle ----------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="access-log-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the flusher after writing everything still queued."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._drain_remaining()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---------------- Producer side ----------------
+    def _too_old(self) -> bool:
+        """True when the oldest queued row has waited longer than max_age_ms."""
+        if not self.max_age_ms or self._oldest_age_ms() <= self.max_age_ms:
+            return False
+        with self._stats_lock:
+            self.age_fallbacks += 1
+        return True
+
+    def submit(self, row: dict):
+        """
+        Queue one access_logs row. Blocks (backpressure) when the queue is
+        full; writes it synchronously when the queue is over max_age_ms.
+        """
+        if not self.running or self._too_old():
+            self._write([row])
+            return
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.sync_fallbacks += 1
+            self._write([row])
+
+    def offer(self, row: dict) -> bool:
+        """
+        Queue one row without waiting. False if the flusher is stopped, the
+        queue is full or its oldest row is over max_age_ms.
+        """
+        if not self.running or self._too_old():
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self.sync_fallbacks += 1
+            return False
+        return True
+
+    # ---------------- Flusher side ----------------
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _drain_remaining(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def _write(self, rows):
+        db = self.session_factory()
+        try:
+            db.execute(insert(models.AccessLog), rows)
+            rollups.record(db, rows)
+            db.commit()
+            with self._stats_lock:
+                self.flushed_rows += len(rows)
+                self.flushed_batches += 1
+        except Exception:
+            db.rollback()
+            with self._stats_lock:
+                self.failed_rows += len(rows)
+            logging.exception(f"[ACCESS LOG] failed to flush {len(rows)} rows")
+        finally:
+            db.close()
+
+    def _oldest_age_ms(self) -> int:
+        with self._queue.mutex:
+            oldest = self._queue.queue[0]["timestamp"] if self._queue.queue else None
+        return int((datetime.utcnow() - oldest).total_seconds() * 1000) if oldest else 0
+
+    def stats(self) -> dict:
+        return {
+            "mode": ACCESS_LOG_MODE,
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "oldest_queued_ms": self._oldest_age_ms(),
+            "max_age_ms": self.max_age_ms,
+            "flushed_rows": self.flushed_rows,
+            "flushed_batches": self.flushed_batches,
+            "sync_fallbacks": self.sync_fallbacks,
+            "age_fallbacks": self.age_fallbacks,
+            "failed_rows": self.failed_rows,
+        }
+
+
+buffer = AccessLogBuffer()
+
+
+def enabled() -> bool:
+    return ACCESS_LOG_MODE == "buffered"
+
+
+def start():
+    if enabled():
+        buffer.start()
+
+
+def stop():
+    if enabled():
+        buffer.stop()
@@ -1,7 +1,13 @@
 # main.py
 from fastapi import FastAPI
-from database import Base, engine
+from database import ASYNC_ENDPOINTS, dispose_async_engine, engine, get_async_engine
 import models
+import instrumentation
+import log_buffer
+import alert_dispatcher
+import report_jobs
+import partitions
+from migrations import run_migrations
 from routers import (
     users,
     patients,
@@ -10,8 +16,10 @@ from routers import (
     metrics,
     reports,
     exports,
+    downloads,
     alerts,
     incidents,
+    live,
 )
 
 # ----------------------------------------------------------
@@ -27,9 +35,38 @@ app = FastAPI(
     },
 )
 
+# Bring the schema (tables + indexes) up to the latest version.
+run_migrations(engine)
 
+# Request latency / in-flight / SQL accounting, served at /metrics/prometheus.
+engines = {"sync": engine}
+if ASYNC_ENDPOINTS:
+    engines["async"] = get_async_engine().sync_engine
+instrumentation.instrument(app, engines)
 
-Base.metadata.create_all(bind=engine)
+# ----------------------------------------------------------
+#  BACKGROUND WORKERS
+# ----------------------------------------------------------
+@app.on_event("startup")
+def start_background_workers():
+    log_buffer.start()
+    alert_dispatcher.start()
+    report_jobs.start()
+    partitions.start()
+
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    # Flush any buffered access logs before the process exits.
+    log_buffer.stop()
+    alert_dispatcher.stop()
+    report_jobs.stop()
+    partitions.stop()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
 
 # ----------------------------------------------------------
 #  ROOT ENDPOINT
@@ -53,8 +90,10 @@ app.include_router(access.router)
 app.include_router(metrics.router)
 app.include_router(reports.router)
 app.include_router(exports.router)
+app.include_router(downloads.router)
 app.include_router(alerts.router)
 app.include_router(incidents.router)
+app.include_router(live.router)
 
 # ----------------------------------------------------------
 #  HEALTH CHECK (for Docker or CI/CD)
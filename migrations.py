@@ -0,0 +1,141 @@
+# migrations.py
+"""
+Lightweight versioned schema migrations.
+
+Applied versions are recorded in the `schema_version` table. Each migration
+runs in its own transaction and must be idempotent: version 1 creates the
+current schema on a fresh database, so later migrations may find their
+changes already in place.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # show applied / pending versions
+"""
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.schema import CreateTable
+
+import models
+import rollups
+from database import Base, engine
+
+
+# ---------------- Helpers ----------------
+def _create_indexes(conn, table):
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _add_column_if_missing(conn, table_name: str, column_ddl: str):
+    column_name = column_ddl.split()[0]
+    existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    if column_name not in existing:
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_ddl}"))
+
+
+# ---------------- Migrations ----------------
+def m001_initial_schema(conn):
+    Base.metadata.create_all(bind=conn)
+
+
+def m002_hot_query_indexes(conn):
+    for model in (models.AccessLog, models.Consent, models.Alert):
+        _create_indexes(conn, model.__table__)
+
+
+def m003_access_rollups(conn):
+    models.AccessRollup.__table__.create(conn, checkfirst=True)
+    rollups.rebuild_with(conn)
+
+
+def m004_alert_access_log_link(conn):
+    _add_column_if_missing(conn, "alerts", "access_log_id INTEGER REFERENCES access_logs(id)")
+    # Backfill existing alerts with the closest denied access by the same user
+    # on the same patient within five minutes of the alert.
+    # One correlated UPDATE; alerts without a match keep NULL.
+    AL, A = models.AccessLog, models.Alert
+    if conn.dialect.name == "sqlite":
+        # SQLite stores datetimes as text, so compare them as Julian days.
+        in_window = func.abs(func.julianday(AL.timestamp) - func.julianday(A.created_at)) <= 5 / 1440
+    else:
+        in_window = AL.timestamp.between(A.created_at - timedelta(minutes=5), A.created_at + timedelta(minutes=5))
+    closest_denial = select(AL.id).where(
+        AL.user_id == A.user_id, AL.patient_id == A.patient_id, AL.is_authorized == False, in_window
+    ).order_by(AL.timestamp.desc()).limit(1).scalar_subquery()
+    conn.execute(
+        update(A).where(A.access_log_id.is_(None), A.created_at.is_not(None)).values(access_log_id=closest_denial)
+    )
+
+
+def m005_access_log_partitions(conn):
+    models.AccessLogPartition.__table__.create(conn, checkfirst=True)
+    if conn.dialect.name == "sqlite":
+        # Rebuild access_logs with AUTOINCREMENT so ids of rows sealed into
+        # monthly partitions are never handed out again.
+        ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'access_logs'")).scalar()
+        if "AUTOINCREMENT" not in (ddl or "").upper():
+            table = models.AccessLog.__table__
+            columns = ", ".join(c.name for c in table.columns)
+            create = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+            conn.execute(text(create.replace("CREATE TABLE access_logs ", "CREATE TABLE access_logs__rebuild ", 1)))
+            conn.execute(text(f"INSERT INTO access_logs__rebuild ({columns}) SELECT {columns} FROM access_logs"))
+            conn.execute(text("DROP TABLE access_logs"))
+            conn.execute(text("ALTER TABLE access_logs__rebuild RENAME TO access_logs"))
+            _create_indexes(conn, table)
+    else:
+        # alerts.access_log_id may point at a row in a partition table.
+        for fk in inspect(conn).get_foreign_keys("alerts"):
+            if fk["referred_table"] == "access_logs" and fk.get("name"):
+                conn.execute(text(f'ALTER TABLE alerts DROP CONSTRAINT "{fk["name"]}"'))
+
+
+MIGRATIONS = [
+    (1, "initial schema", m001_initial_schema),
+    (2, "indexes for access log, consent and alert hot queries", m002_hot_query_indexes),
+    (3, "hourly access rollups (with backfill)", m003_access_rollups),
+    (4, "link alerts to the access log that triggered them", m004_alert_access_log_link),
+    (5, "monthly access log partitions", m005_access_log_partitions),
+]
+
+
+# ---------------- Runner ----------------
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at DATETIME NOT NULL)"
+    ))
+
+
+def applied_versions(bind=engine) -> set:
+    with bind.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+
+
+def run_migrations(bind=engine) -> list:
+    """Apply every pending migration in order. Returns the versions applied."""
+    done = applied_versions(bind)
+    applied = []
+    for version, name, fn in MIGRATIONS:
+        if version in done:
+            continue
+        with bind.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()},
+            )
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        done = applied_versions()
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4}  {'applied' if version in done else 'pending':<8} {name}")
+    else:
+        applied = run_migrations()
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date.")
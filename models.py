@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -11,7 +11,8 @@ class User(Base):
     role = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False)
 
-    alerts_user = relationship("Alert", back_populates="user", lazy="joined")
+    # Loaded on demand; queries that need it opt in with joinedload/selectinload.
+    alerts_user = relationship("Alert", back_populates="user", lazy="select")
 
 class Patient(Base):
     __tablename__ = "patients"
@@ -20,7 +21,7 @@ class Patient(Base):
     dob = Column(String)
     record_id = Column(String, unique=True)
 
-    alerts_patient = relationship("Alert", back_populates="patient", lazy="joined")
+    alerts_patient = relationship("Alert", back_populates="patient", lazy="select")
 
 
 class Consent(Base):
@@ -35,6 +36,11 @@ class Consent(Base):
     patient = relationship("Patient")
     user = relationship("User")
 
+    __table_args__ = (
+        # Every access check looks consents up by (user_id, patient_id).
+        Index("ix_consents_user_patient", "user_id", "patient_id"),
+    )
+
 class AccessLog(Base):
     __tablename__ = "access_logs"
     id = Column(Integer, primary_key=True, index=True)
@@ -44,16 +50,64 @@ class AccessLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     is_authorized = Column(Boolean, default=True)
 
+    __table_args__ = (
+        # Windowed reads (/logs, /metrics/overview, exports) filter and sort on timestamp,
+        # optionally narrowed by user, patient or outcome.
+        Index("ix_access_logs_timestamp", "timestamp"),
+        Index("ix_access_logs_user_ts", "user_id", "timestamp"),
+        Index("ix_access_logs_patient_ts", "patient_id", "timestamp"),
+        Index("ix_access_logs_auth_ts", "is_authorized", "timestamp"),
+        # Ids must never be reused once old rows move out to monthly partitions.
+        {"sqlite_autoincrement": True},
+    )
+
+class AccessLogPartition(Base):
+    """Catalog of monthly access-log partitions sealed out of access_logs (see partitions.py)."""
+    __tablename__ = "access_log_partitions"
+    id = Column(Integer, primary_key=True)
+    month = Column(String, unique=True, nullable=False)  # "YYYY-MM"
+    table_name = Column(String, nullable=False)
+    range_start = Column(DateTime, nullable=False)  # inclusive
+    range_end = Column(DateTime, nullable=False)  # exclusive
+    rows = Column(Integer, nullable=False, default=0)
+    min_id = Column(Integer)
+    max_id = Column(Integer)
+    status = Column(String, nullable=False, default="sealed")  # sealed / archived / dropped
+    archive_path = Column(String)
+    sealed_at = Column(DateTime)
+    retired_at = Column(DateTime)
+
+class AccessRollup(Base):
+    """Hourly access counts per action, maintained as access logs are written."""
+    __tablename__ = "access_rollups"
+    id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, nullable=False)  # start of the UTC hour
+    action = Column(String, nullable=False, default="")
+    authorized = Column(Integer, nullable=False, default=0)
+    breaches = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("bucket", "action", name="uq_access_rollups_bucket_action"),
+    )
+
 class Alert(Base):
     __tablename__ = "alerts"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     patient_id = Column(Integer, ForeignKey("patients.id"), nullable=True)
+    # The denied access that raised it. Not a foreign key: the row may have
+    # moved to a monthly partition (see partitions.py).
+    access_log_id = Column(Integer, nullable=True)
     message = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     resolved = Column(Boolean, default=False)
 
-    # Optional relationships (for joined queries)
-    user = relationship("User", back_populates="alerts_user", lazy="joined")
-    patient = relationship("Patient", back_populates="alerts_patient", lazy="joined")
+    # Optional relationships; load them explicitly per query (see routers/alerts.py)
+    user = relationship("User", back_populates="alerts_user", lazy="select")
+    patient = relationship("Patient", back_populates="alerts_patient", lazy="select")
+
+    __table_args__ = (
+        Index("ix_alerts_created_at", "created_at"),
+        Index("ix_alerts_resolved_created", "resolved", "created_at"),
+    )
@@ -0,0 +1,116 @@
+# pagination.py
+"""
+Keyset (cursor) pagination on (timestamp, id), newest first, or on id alone,
+oldest first, plus watermark reads of rows newer than a given id or timestamp.
+
+Cursors are opaque url-safe strings encoding the (timestamp, id) of the last
+row on a page. The next page is everything strictly after that key in
+(timestamp DESC, id DESC) order, so deep pages cost the same as the first.
+"""
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    raw = json.dumps([ts.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(ts), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def paginate(q, ts_col, id_col, limit: int, cursor=None, response: Response = None):
+    """
+    Apply keyset ordering/filtering to `q` and return one page of rows.
+    When more rows follow, the next cursor is set on the response header.
+    """
+    if cursor:
+        c_ts, c_id = decode_cursor(cursor)
+        q = q.filter(or_(ts_col < c_ts, and_(ts_col == c_ts, id_col < c_id)))
+    rows = q.order_by(ts_col.desc(), id_col.desc()).limit(limit + 1).all()
+
+    page = rows[:limit]
+    if len(rows) > limit and page and response is not None:
+        last = page[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(last, ts_col.key), getattr(last, id_col.key)
+        )
+    return page
+
+
+def paginate_many(sources, limit: int, cursor=None, response: Response = None):
+    """
+    paginate() across several (query, ts_col, id_col) sources whose time
+    ranges do not overlap, newest source first. Older sources are only
+    queried when the newer ones cannot fill the page.
+    """
+    rows = []
+    for q, ts_col, id_col in sources:
+        rows.extend(paginate(q, ts_col, id_col, limit + 1 - len(rows), cursor))
+        if len(rows) > limit:
+            break
+
+    page = rows[:limit]
+    if len(rows) > limit and page and response is not None:
+        _, ts_col, id_col = sources[0]
+        last = page[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(last, ts_col.key), getattr(last, id_col.key)
+        )
+    return page
+
+
+def rows_after(sources, limit: int, after_id: int = None, after_ts: datetime = None):
+    """
+    Rows newer than a watermark across (query, ts_col, id_col) sources, oldest
+    first, at most `limit`. With `after_id` rows come in id order, which also
+    catches late-arriving rows with older timestamps; with `after_ts` alone they
+    come in (timestamp, id) order. Pass the last row's id (or timestamp) back as
+    the next watermark; a full page means more rows are waiting.
+    """
+    rows = []
+    for q, ts_col, id_col in sources:
+        if after_id is not None:
+            q = q.filter(id_col > after_id)
+        if after_ts is not None:
+            q = q.filter(ts_col > after_ts)
+        order = (id_col.asc(),) if after_id is not None else (ts_col.asc(), id_col.asc())
+        rows.extend(q.order_by(*order).limit(limit).all())
+
+    if len(sources) > 1:
+        _, ts_col, id_col = sources[0]
+        if after_id is not None:
+            rows.sort(key=lambda r: getattr(r, id_col.key))
+        else:
+            rows.sort(key=lambda r: (getattr(r, ts_col.key), getattr(r, id_col.key)))
+    return rows[:limit]
+
+
+def paginate_by_id(q, id_col, limit: int, cursor=None, response: Response = None):
+    """Keyset pagination on a single ascending integer key."""
+    if cursor:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            after = int(base64.urlsafe_b64decode(padded))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        q = q.filter(id_col > after)
+    rows = q.order_by(id_col.asc()).limit(limit + 1).all()
+
+    page = rows[:limit]
+    if len(rows) > limit and page and response is not None:
+        last_id = str(getattr(page[-1], id_col.key)).encode("ascii")
+        response.headers[NEXT_CURSOR_HEADER] = base64.urlsafe_b64encode(last_id).decode("ascii").rstrip("=")
+    return page
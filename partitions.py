@@ -0,0 +1,369 @@
+# partitions.py
+"""
+Monthly partitions for access logs.
+
+New rows are always written to the live `access_logs` table. Maintenance seals
+every month that ended more than ACCESS_LOG_SEAL_GRACE_HOURS ago: its rows move
+in (timestamp, id) order, ACCESS_LOG_SEAL_BATCH rows per short transaction,
+into an `access_logs_YYYY_MM` table with the same columns and indexes, and the
+month is recorded in the `access_log_partitions` catalog.
+
+Readers go through `log_sources` / `log_entities`, which return the live table
+followed by the sealed partitions overlapping the requested window, newest
+first. Sealed months are strictly older than what remains in the live table,
+so windowed reads can walk the sources in order and stop as soon as they have
+enough rows.
+
+Retention: with ACCESS_LOG_RETENTION_MONTHS > 0, partitions for months that
+ended more than that many months ago are retired. They are copied to an SQLite
+file in ACCESS_LOG_ARCHIVE_DIR when it is set (SQLite only) and then dropped.
+Retiring is a catalog update plus one DROP TABLE, so live writes are never
+held up behind a bulk delete.
+
+Usage:
+    python partitions.py status
+    python partitions.py seal
+    python partitions.py retention
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, func, insert, inspect, select, text, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import models
+from database import engine
+
+ACCESS_LOG_PARTITIONING = os.getenv("ACCESS_LOG_PARTITIONING", "1") == "1"
+ACCESS_LOG_SEAL_GRACE_HOURS = int(os.getenv("ACCESS_LOG_SEAL_GRACE_HOURS", "24"))
+ACCESS_LOG_SEAL_BATCH = int(os.getenv("ACCESS_LOG_SEAL_BATCH", "5000"))
+ACCESS_LOG_RETENTION_MONTHS = int(os.getenv("ACCESS_LOG_RETENTION_MONTHS", "0"))  # 0 keeps every partition
+ACCESS_LOG_ARCHIVE_DIR = os.getenv("ACCESS_LOG_ARCHIVE_DIR", "")
+PARTITION_MAINTENANCE_SECONDS = int(os.getenv("PARTITION_MAINTENANCE_SECONDS", "3600"))
+PARTITION_MAINTENANCE_DELAY = int(os.getenv("PARTITION_MAINTENANCE_DELAY", "60"))
+PARTITION_DROP_DELAY = float(os.getenv("PARTITION_DROP_DELAY", "5"))
+
+AL = models.AccessLog
+P = models.AccessLogPartition
+SEALED, RETIRING, ARCHIVED, DROPPED = "sealed", "retiring", "archived", "dropped"
+PARTITION_NAME = re.compile(r"^access_logs_\d{4}_\d{2}$")
+
+_metadata = MetaData()  # partition tables live outside Base.metadata
+_entities = {}
+_lock = threading.Lock()
+
+
+# ---------------- Months ----------------
+def month_start(ts: datetime) -> datetime:
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(ts: datetime, n: int) -> datetime:
+    index = ts.year * 12 + ts.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def month_key(ts: datetime) -> str:
+    return ts.strftime("%Y-%m")
+
+
+def table_name(ts: datetime) -> str:
+    return ts.strftime("access_logs_%Y_%m")
+
+
+# ---------------- Partition tables ----------------
+def partition_table(name: str) -> Table:
+    """Table object for a partition: access_logs' columns and secondary indexes."""
+    with _lock:
+        table = _metadata.tables.get(name)
+        if table is None:
+            table = Table(name, _metadata, *[
+                Column(c.name, c.type, primary_key=c.primary_key, autoincrement=False)
+                for c in AL.__table__.columns
+            ])
+            for index in AL.__table__.indexes:
+                if all(c.primary_key for c in index.columns):
+                    continue
+                Index(index.name.replace("access_logs", name, 1), *[table.c[c.name] for c in index.columns])
+        return table
+
+
+def log_entity(table: Table):
+    """AccessLog itself for the live table, or AccessLog mapped onto a partition."""
+    if table is AL.__table__:
+        return AL
+    with _lock:
+        entity = _entities.get(table.name)
+        if entity is None:
+            entity = _entities[table.name] = aliased(AL, table, adapt_on_names=True, name=table.name)
+        return entity
+
+
+# ---------------- Query layer ----------------
+def sealed_partitions(db, since_ts: datetime = None, until_ts: datetime = None) -> list:
+    """Catalog rows of sealed partitions overlapping [since_ts, until_ts], newest first."""
+    stmt = select(P.month, P.table_name, P.range_start, P.range_end).where(P.status == SEALED)
+    if since_ts is not None:
+        stmt = stmt.where(P.range_end > since_ts)
+    if until_ts is not None:
+        stmt = stmt.where(P.range_start <= until_ts)
+    return db.execute(stmt.order_by(P.range_start.desc())).all()
+
+
+def log_sources(db, since_ts: datetime = None, until_ts: datetime = None) -> list:
+    """Tables holding access logs in the window: access_logs, then overlapping partitions, newest first."""
+    return [AL.__table__] + [partition_table(p.table_name) for p in sealed_partitions(db, since_ts, until_ts)]
+
+
+def log_entities(db, since_ts: datetime = None, until_ts: datetime = None) -> list:
+    """ORM form of log_sources; each entity exposes AccessLog's attributes."""
+    return [log_entity(t) for t in log_sources(db, since_ts, until_ts)]
+
+
+def find_logs(db, ids) -> dict:
+    """id -> row for access logs that have moved to sealed partitions."""
+    missing = set(ids)
+    found = {}
+    if not missing:
+        return found
+    candidates = db.execute(
+        select(P.table_name).where(P.status == SEALED, P.min_id <= max(missing), P.max_id >= min(missing))
+    ).scalars().all()
+    for name in candidates:
+        table = partition_table(name)
+        for row in db.execute(select(table).where(table.c.id.in_(missing - found.keys()))):
+            found[row.id] = row
+    return found
+
+
+# ---------------- Sealing ----------------
+def _ensure_partition(conn, start: datetime):
+    """Create the month's table and catalog entry. Returns None if the month was already retired."""
+    key = month_key(start)
+    status = conn.execute(select(P.status).where(P.month == key)).scalar()
+    if status is not None and status != SEALED:
+        return None
+    table = partition_table(table_name(start))
+    conn.execute(CreateTable(table, if_not_exists=True))
+    for index in table.indexes:
+        conn.execute(CreateIndex(index, if_not_exists=True))
+    if status is None:
+        conn.execute(insert(P).values(
+            month=key, table_name=table.name, range_start=start, range_end=add_months(start, 1),
+            rows=0, status=SEALED, sealed_at=datetime.utcnow(),
+        ))
+    return table
+
+
+def _seal_month(bind, start: datetime, batch: int) -> int:
+    end = add_months(start, 1)
+    columns = [c.name for c in AL.__table__.columns]
+    table = None
+    total = 0
+    while True:
+        # One short transaction per batch: copy the oldest rows, then delete them.
+        with bind.begin() as conn:
+            ids = conn.execute(
+                select(AL.id).where(AL.timestamp >= start, AL.timestamp < end)
+                .order_by(AL.timestamp, AL.id).limit(batch)
+            ).scalars().all()
+            if not ids:
+                return total
+            if table is None:
+                table = _ensure_partition(conn, start)
+                if table is None:
+                    logging.warning(f"[PARTITIONS] {month_key(start)} is retired; leaving late rows in access_logs")
+                    return total
+            moved = conn.execute(insert(table).from_select(
+                columns, select(*[AL.__table__.c[c] for c in columns]).where(AL.id.in_(ids))
+            )).rowcount
+            conn.execute(delete(AL).where(AL.id.in_(ids)))
+            current = conn.execute(select(P.min_id, P.max_id).where(P.month == month_key(start))).one()
+            conn.execute(update(P).where(P.month == month_key(start)).values(
+                rows=P.rows + moved,
+                min_id=min(i for i in (current.min_id, min(ids)) if i is not None),
+                max_id=max(i for i in (current.max_id, max(ids)) if i is not None),
+            ))
+            total += moved
+
+
+def seal(bind=engine, now: datetime = None, batch: int = ACCESS_LOG_SEAL_BATCH) -> dict:
+    """Move every month that ended more than the grace period ago out of access_logs.
+    Returns {month: rows moved}."""
+    cutoff = month_start((now or datetime.utcnow()) - timedelta(hours=ACCESS_LOG_SEAL_GRACE_HOURS))
+    with bind.connect() as conn:
+        oldest = conn.execute(select(func.min(AL.timestamp)).where(AL.timestamp < cutoff)).scalar()
+    moved = {}
+    start = month_start(oldest) if oldest else cutoff
+    while start < cutoff:
+        count = _seal_month(bind, start, batch)
+        if count:
+            moved[month_key(start)] = count
+        start = add_months(start, 1)
+    return moved
+
+
+# ---------------- Retention ----------------
+def _archive(bind, name: str, archive_dir: str) -> str:
+    """Copy a partition into its own SQLite file. Reads only, so writers are not blocked."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.abspath(os.path.join(archive_dir, f"{name}.db"))
+    with bind.connect() as conn:
+        conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (path,))
+        try:
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS archive."{name}"')
+            conn.exec_driver_sql(f'CREATE TABLE archive."{name}" AS SELECT * FROM main."{name}"')
+            copied = conn.exec_driver_sql(f'SELECT count(*) FROM archive."{name}"').scalar()
+            expected = conn.exec_driver_sql(f'SELECT count(*) FROM main."{name}"').scalar()
+            conn.commit()
+        finally:
+            conn.exec_driver_sql("DETACH DATABASE archive")
+    if copied != expected:
+        raise RuntimeError(f"archive of {name} has {copied} rows, expected {expected}")
+    return path
+
+
+def enforce_retention(bind=engine, now: datetime = None, months: int = None, archive_dir: str = None,
+                      drop_delay: float = PARTITION_DROP_DELAY) -> list:
+    """Archive (optionally) and drop partitions older than the retention window.
+    Returns the months retired."""
+    months = ACCESS_LOG_RETENTION_MONTHS if months is None else months
+    archive_dir = ACCESS_LOG_ARCHIVE_DIR if archive_dir is None else archive_dir
+    if months <= 0:
+        return []
+    if archive_dir and bind.dialect.name != "sqlite":
+        logging.warning("[PARTITIONS] ACCESS_LOG_ARCHIVE_DIR is only supported on SQLite; keeping partitions")
+        return []
+    horizon = add_months(month_start(now or datetime.utcnow()), -months)
+    with bind.connect() as conn:
+        expired = conn.execute(
+            select(P.month, P.table_name).where(P.status == SEALED, P.range_end <= horizon).order_by(P.range_start)
+        ).all()
+
+    retired = []
+    for month, name in expired:
+        # Claim the partition; readers stop selecting it from here on.
+        with bind.begin() as conn:
+            claimed = conn.execute(
+                update(P).where(P.month == month, P.status == SEALED).values(status=RETIRING)
+            ).rowcount
+        if not claimed:
+            continue  # another worker is retiring it
+        try:
+            path = _archive(bind, name, archive_dir) if archive_dir else None
+        except Exception:
+            logging.exception(f"[PARTITIONS] archiving {name} failed")
+            with bind.begin() as conn:
+                conn.execute(update(P).where(P.month == month).values(status=SEALED))
+            continue
+        with bind.begin() as conn:
+            conn.execute(update(P).where(P.month == month).values(
+                status=ARCHIVED if path else DROPPED, archive_path=path, retired_at=datetime.utcnow()
+            ))
+        retired.append((month, name))
+
+    if retired:
+        # Let requests that read the catalog just before the update finish with the tables.
+        time.sleep(drop_delay)
+        for _, name in retired:
+            with bind.begin() as conn:
+                partition_table(name).drop(conn, checkfirst=True)
+    return [month for month, _ in retired]
+
+
+def drop_all(bind=engine):
+    """Drop every partition table (used when the schema is recreated from scratch)."""
+    names = [n for n in inspect(bind).get_table_names() if PARTITION_NAME.match(n)]
+    with bind.begin() as conn:
+        for name in names:
+            conn.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+
+
+# ---------------- Background maintenance ----------------
+class PartitionMaintainer:
+    def __init__(self, bind=engine, interval: int = PARTITION_MAINTENANCE_SECONDS):
+        self.bind = bind
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+        self.last_sealed = {}
+        self.last_retired = []
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="partition-maintainer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+    def run_once(self):
+        try:
+            self.last_sealed = seal(self.bind)
+            self.last_retired = enforce_retention(self.bind)
+        except Exception:
+            self.failures += 1
+            logging.exception("[PARTITIONS] maintenance failed")
+        self.runs += 1
+        self.last_run = datetime.utcnow()
+
+    def _loop(self):
+        if self._stop.wait(PARTITION_MAINTENANCE_DELAY):
+            return
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ACCESS_LOG_PARTITIONING,
+            "interval_seconds": self.interval,
+            "retention_months": ACCESS_LOG_RETENTION_MONTHS,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+            "last_sealed": self.last_sealed,
+            "last_retired": self.last_retired,
+        }
+
+
+maintainer = PartitionMaintainer()
+
+
+def start():
+    if ACCESS_LOG_PARTITIONING:
+        maintainer.start()
+
+
+def stop():
+    maintainer.stop()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "seal":
+        print(f"Sealed: {seal() or 'nothing to seal'}")
+    elif command == "retention":
+        print(f"Retired: {enforce_retention() or 'nothing expired'}")
+    elif command == "status":
+        with engine.connect() as conn:
+            rows = conn.execute(select(P.month, P.status, P.rows, P.table_name, P.archive_path).order_by(P.month)).all()
+            live = conn.execute(select(func.count()).select_from(AL)).scalar()
+        print(f"{'access_logs':<20} {'live':<9} {live:>10}")
+        for month, status, count, name, path in rows:
+            print(f"{name:<20} {status:<9} {count:>10}  {path or ''}")
+    else:
+        print(__doc__)
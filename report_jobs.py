@@ -0,0 +1,219 @@
+# report_jobs.py
+"""
+Background audit-report jobs with a cached PDF artifact store.
+
+POST creates a job for a window (`since_minutes`); worker threads render it
+with report_render.render_audit_report. Finished PDFs are cached per window
+for REPORT_CACHE_TTL seconds (LRU-bounded by REPORT_CACHE_SIZE), so repeated
+requests for the same window are served without re-rendering. A scheduler
+thread re-renders the daily (1440-minute) report every REPORT_PREGENERATE_SECONDS
+so the common case is always warm.
+
+The plotting stack (matplotlib, reportlab) is only imported when the first
+report renders; the first pre-generation waits REPORT_PREGENERATE_DELAY
+seconds so worker start-up does not pay for it.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from database import SessionLocal
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "4"))
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "16"))
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", "300"))
+REPORT_PREGENERATE = os.getenv("REPORT_PREGENERATE", "1") == "1"
+REPORT_PREGENERATE_SECONDS = int(os.getenv("REPORT_PREGENERATE_SECONDS", "240"))
+REPORT_PREGENERATE_DELAY = int(os.getenv("REPORT_PREGENERATE_DELAY", "60"))
+REPORT_MAX_JOBS = 500
+DAILY_WINDOW = 1440
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+class ReportJob:
+    def __init__(self, since_minutes: int):
+        self.id = uuid.uuid4().hex
+        self.since_minutes = since_minutes
+        self.status = PENDING
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.error = None
+        self.cached = False
+        self.pdf = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "since_minutes": self.since_minutes,
+            "status": self.status,
+            "cached": self.cached,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "size_bytes": len(self.pdf) if self.pdf else None,
+        }
+
+
+class ArtifactCache:
+    """since_minutes -> (pdf bytes, rendered_at monotonic), LRU with TTL."""
+
+    def __init__(self, maxsize: int = REPORT_CACHE_SIZE, ttl: int = REPORT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and time.monotonic() - entry[1] <= self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._data[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, pdf: bytes):
+        with self._lock:
+            self._data[key] = (pdf, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "maxsize": self.maxsize, "ttl_seconds": self.ttl,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class ReportJobQueue:
+    def __init__(self, workers: int = REPORT_WORKERS, session_factory=SessionLocal):
+        self.workers = workers
+        self.session_factory = session_factory
+        self.cache = ArtifactCache()
+        self._jobs = OrderedDict()
+        self._inflight = {}  # since_minutes -> job already rendering that window
+        self._lock = threading.Lock()
+        self._executor = None
+        self._scheduler = None
+        self._stop = threading.Event()
+
+    # ---------------- Lifecycle ----------------
+    def start(self, pregenerate: bool = REPORT_PREGENERATE):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report-worker")
+        if pregenerate and self._scheduler is None:
+            self._stop.clear()
+            self._scheduler = threading.Thread(target=self._pregenerate_loop, name="report-scheduler", daemon=True)
+            self._scheduler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._scheduler:
+            self._scheduler.join(5)
+            self._scheduler = None
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    # ---------------- Jobs ----------------
+    def submit(self, since_minutes: int, force: bool = False) -> ReportJob:
+        """Create a job for the window; served from cache or an in-flight render when possible."""
+        cached = None if force else self.cache.get(since_minutes)
+        with self._lock:
+            running = self._inflight.get(since_minutes)
+            if cached is None and running is not None and not force:
+                # Share the render already in progress for this window.
+                return running
+            job = ReportJob(since_minutes)
+            self._remember(job)
+            if cached is not None:
+                self._finish(job, pdf=cached, cached=True)
+                return job
+            self._inflight[since_minutes] = job
+
+        if self._executor is None:
+            self._run(job)
+        else:
+            self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _remember(self, job: ReportJob):
+        self._jobs[job.id] = job
+        while len(self._jobs) > REPORT_MAX_JOBS:
+            self._jobs.popitem(last=False)
+
+    def _finish(self, job: ReportJob, pdf=None, error=None, cached=False):
+        job.pdf = pdf
+        job.error = error
+        job.cached = cached
+        job.status = FAILED if error else DONE
+        job.finished_at = datetime.utcnow()
+        job.done.set()
+
+    def _run(self, job: ReportJob):
+        # Imported on first use: report_render loads matplotlib and reportlab,
+        # which API workers should not pay for at start-up. (It also imports
+        # routers.metrics, which would be circular at module import time.)
+        from report_render import render_audit_report
+
+        job.status = RUNNING
+        db = self.session_factory()
+        try:
+            pdf = render_audit_report(db, job.since_minutes)
+            self.cache.put(job.since_minutes, pdf)
+            self._finish(job, pdf=pdf)
+        except Exception as e:
+            logging.exception(f"[REPORT] job {job.id} failed")
+            self._finish(job, error=str(e))
+        finally:
+            db.close()
+            with self._lock:
+                if self._inflight.get(job.since_minutes) is job:
+                    del self._inflight[job.since_minutes]
+
+    def _pregenerate_loop(self):
+        if self._stop.wait(REPORT_PREGENERATE_DELAY):
+            return
+        while not self._stop.is_set():
+            try:
+                self.submit(DAILY_WINDOW, force=True)
+            except Exception:
+                logging.exception("[REPORT] daily pre-generation failed")
+            self._stop.wait(REPORT_PREGENERATE_SECONDS)
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_status = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {"workers": self.workers, "jobs": by_status, "cache": self.cache.stats()}
+
+
+queue = ReportJobQueue()
+
+
+def start():
+    queue.start()
+
+
+def stop():
+    queue.stop()
@@ -0,0 +1,105 @@
+# report_render.py
+"""
+Audit report rendering. Each call builds its own Figure on an Agg canvas and
+hands the PNG to reportlab in memory -- no pyplot global state and no files --
+so any number of reports can render in parallel threads.
+"""
+from datetime import datetime
+from io import BytesIO
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+import models
+from routers.metrics import metrics_overview
+
+
+def _window_short(since_minutes: int) -> str:
+    return f"{since_minutes // 60}h" if since_minutes % 60 == 0 else f"{since_minutes}m"
+
+
+def _window_long(since_minutes: int) -> str:
+    return f"{since_minutes // 60} Hours" if since_minutes % 60 == 0 else f"{since_minutes} Minutes"
+
+
+def render_audit_report(db, since_minutes: int = 1440) -> bytes:
+    """Build the PHIPA audit summary PDF for the last `since_minutes` and return its bytes."""
+    metrics = metrics_overview(db, since_minutes)
+    alerts = db.query(models.Alert).order_by(models.Alert.created_at.desc()).limit(10).all()
+
+    # Chart
+    fig = Figure(figsize=(6, 3))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    if metrics["series"]:
+        df = metrics["series"]
+        buckets = [r["bucket"] for r in df]
+        auth = [r["authorized"] for r in df]
+        breach = [r["breaches"] for r in df]
+        ax.plot(buckets, auth, label="Authorized", color="green", marker="o")
+        ax.plot(buckets, breach, label="Breaches", color="red", marker="o")
+        ax.legend()
+        ax.set_xlabel("Time")
+        ax.set_ylabel("Access Count")
+        ax.set_title(f"Access Trend (Last {_window_short(since_minutes)})")
+    else:
+        ax.text(0.5, 0.5, "No Data", ha='center', va='center')
+
+    img_buf = BytesIO()
+    fig.tight_layout()
+    fig.savefig(img_buf, format="png")
+    img_buf.seek(0)
+
+    # PDF
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    elements = []
+
+    elements.append(Paragraph("<b>PHIPA Audit Summary Report</b>", styles["Title"]))
+    elements.append(Spacer(1, 12))
+
+    summary_data = [
+        ["Generated On", datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")],
+        ["Time Window", f"Last {_window_long(since_minutes)}"],
+        ["Compliance (%)", f"{metrics['compliance_pct']} %"],
+        ["Total Accesses", metrics["total_accesses"]],
+        ["Authorized Accesses", metrics["authorized_accesses"]],
+        ["Breaches", metrics["breaches"]],
+        ["Open Alerts", metrics["open_alerts"]],
+    ]
+    summary_table = Table(summary_data, colWidths=[150, 200])
+    summary_table.setStyle(TableStyle([
+        ("BOX", (0, 0), (-1, -1), 0.25, colors.black),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 12))
+
+    elements.append(Paragraph("<b>Access Trend</b>", styles["Heading2"]))
+    elements.append(Image(img_buf, width=400, height=200))
+    elements.append(Spacer(1, 12))
+
+    elements.append(Paragraph("<b>Recent Breach Alerts</b>", styles["Heading2"]))
+    if alerts:
+        alert_rows = [["Date", "Message", "Resolved"]]
+        for a in alerts:
+            alert_rows.append([
+                a.created_at.strftime("%Y-%m-%d %H:%M"),
+                a.message,
+                "Yes" if a.resolved else "No"
+            ])
+        alert_table = Table(alert_rows, colWidths=[100, 280, 60])
+        alert_table.setStyle(TableStyle([
+            ("BOX", (0, 0), (-1, -1), 0.25, colors.black),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ]))
+        elements.append(alert_table)
+    else:
+        elements.append(Paragraph("No breach alerts recorded.", styles["Normal"]))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
@@ -0,0 +1,134 @@
+# rollups.py
+"""
+Hourly access rollups backing /metrics/overview.
+
+`record` is called in the same transaction as every access log insert, so
+`access_rollups` always matches `access_logs`. `rebuild` recomputes the table
+from the raw logs, live and sealed partitions alike (backfill after a
+migration, or repair). Buckets older than the oldest retained log are kept,
+so aggregates outlive partitions dropped by retention.
+
+Usage:
+    python rollups.py rebuild
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import case, delete, func, inspect, insert, select, union_all
+
+import models
+import partitions
+
+AL = models.AccessLog
+AR = models.AccessRollup
+
+
+def hour_bucket(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _upsert(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(AR)
+    return stmt.on_conflict_do_update(
+        index_elements=[AR.bucket, AR.action],
+        set_={
+            "authorized": AR.authorized + stmt.excluded.authorized,
+            "breaches": AR.breaches + stmt.excluded.breaches,
+        },
+    )
+
+
+def record(db, rows):
+    """Add access_logs row dicts to their hourly buckets. Does not commit."""
+    counts = defaultdict(lambda: [0, 0])
+    for row in rows:
+        key = (hour_bucket(row["timestamp"]), row.get("action") or "")
+        counts[key][0 if row["is_authorized"] else 1] += 1
+    if not counts:
+        return
+    db.execute(_upsert(db.get_bind().dialect.name), [
+        {"bucket": bucket, "action": action, "authorized": auth, "breaches": breach}
+        for (bucket, action), (auth, breach) in counts.items()
+    ])
+
+
+def _hour_expr(dialect_name: str, ts=AL.timestamp):
+    if dialect_name == "postgresql":
+        return func.date_trunc("hour", ts)
+    # Match SQLAlchemy's SQLite DateTime storage format so buckets compare equal.
+    return func.strftime("%Y-%m-%d %H:00:00.000000", ts)
+
+
+def rebuild_with(conn):
+    """Recompute every rollup bucket covered by retained access logs on an open connection."""
+    if inspect(conn).has_table(models.AccessLogPartition.__tablename__):
+        sources = partitions.log_sources(conn)
+    else:
+        sources = [AL.__table__]  # upgrading from before partitioning
+    oldest = min(
+        (ts for ts in (conn.execute(select(func.min(t.c.timestamp))).scalar() for t in sources) if ts is not None),
+        default=None,
+    )
+    if oldest is None:
+        return
+    logs = union_all(*[select(t.c.timestamp, t.c.action, t.c.is_authorized) for t in sources]).subquery()
+    hour = _hour_expr(conn.dialect.name, logs.c.timestamp).label("bucket")
+    action = func.coalesce(logs.c.action, "").label("action")
+    conn.execute(delete(AR).where(AR.bucket >= hour_bucket(oldest)))
+    conn.execute(insert(AR).from_select(
+        ["bucket", "action", "authorized", "breaches"],
+        select(
+            hour, action,
+            func.sum(case((logs.c.is_authorized == True, 1), else_=0)),
+            func.sum(case((logs.c.is_authorized == False, 1), else_=0)),
+        ).group_by(hour, action),
+    ))
+
+
+def rebuild(bind):
+    """Recompute every rollup bucket from access_logs in one transaction."""
+    with bind.begin() as conn:
+        rebuild_with(conn)
+
+
+def hourly_series(db, since_ts):
+    """
+    Per-hour (bucket, authorized, breaches) since `since_ts`, oldest first.
+    Whole hours come from the rollups; the partial leading hour is counted
+    from the raw logs so totals stay exact for any window.
+    """
+    first_bucket = hour_bucket(since_ts)
+    full_from = first_bucket if first_bucket == since_ts else first_bucket + timedelta(hours=1)
+
+    series = []
+    if full_from > since_ts:
+        auth = breach = 0
+        for log in partitions.log_entities(db, since_ts, full_from):
+            a, b = db.query(
+                func.sum(case((log.is_authorized == True, 1), else_=0)),
+                func.sum(case((log.is_authorized == False, 1), else_=0)),
+            ).filter(log.timestamp >= since_ts, log.timestamp < full_from).one()
+            auth, breach = auth + int(a or 0), breach + int(b or 0)
+        if auth or breach:
+            series.append((first_bucket, auth, breach))
+
+    rows = db.query(
+        AR.bucket, func.sum(AR.authorized), func.sum(AR.breaches)
+    ).filter(AR.bucket >= full_from).group_by(AR.bucket).order_by(AR.bucket).all()
+    series.extend((bucket, int(auth or 0), int(breach or 0)) for bucket, auth, breach in rows)
+    return series
+
+
+if __name__ == "__main__":
+    import sys
+    from database import engine
+
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        rebuild(engine)
+        print("Rebuilt access_rollups from access_logs.")
+    else:
+        print(__doc__)
@@ -6,8 +6,10 @@ from . import (
     metrics,
     reports,
     exports,
+    downloads,
     alerts,
     incidents,
+    live,
 )
 
 __all__ = [
@@ -18,6 +20,8 @@ __all__ = [
     "metrics",
     "reports",
     "exports",
+    "downloads",
     "alerts",
     "incidents",
+    "live",
 ]
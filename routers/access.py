@@ -1,42 +1,141 @@
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
-import models, schemas, crud
-from alerts_utils import send_breach_alert, log_alert
+from database import ASYNC_ENDPOINTS, SessionLocal, get_async_db, get_db
+import schemas, crud
+import consent_cache
+import alert_dispatcher
+import event_bus
+from alerts_utils import log_alerts
 
 
 router = APIRouter(prefix="/access", tags=["Access Control"])
 
-@router.post("/")
-def access_patient_record(log: schemas.AccessLogBase, db: Session = Depends(get_db)):
-    consent = db.query(models.Consent).filter_by(
-        patient_id=log.patient_id, user_id=log.user_id
-    ).first()
+def _decide(consent, action: str):
+    """Return (authorized, reason) for a cached (can_view, can_edit) consent."""
+    if consent:
+        can_view, can_edit = consent
+        if action == "view" and can_view:
+            return True, ""
+        if action == "edit" and can_edit:
+            return True, ""
+        return False, "User lacks required permission."
+    return False, "No consent exists for this user and patient."
 
-    authorized = False
-    reason = ""
 
-    if consent:
-        if log.action == "view" and consent.can_view:
-            authorized = True
-        elif log.action == "edit" and consent.can_edit:
-            authorized = True
-        else:
-            reason = "User lacks required permission."
-    else:
-        reason = "No consent exists for this user and patient."
+def _access_event(log_id, log: schemas.AccessLogBase, authorized: bool, timestamp) -> dict:
+    event = {
+        "user_id": log.user_id, "patient_id": log.patient_id,
+        "action": log.action, "authorized": authorized, "timestamp": timestamp,
+    }
+    if log_id is not None:
+        # Unknown for granted checks queued in the log buffer (ACCESS_LOG_MODE=buffered).
+        event["id"] = log_id
+    return event
+
+
+def _check_and_log(db: Session, log: schemas.AccessLogBase, wait: bool = True):
+    """Decide and record one access check. Returns (authorized, reason, access log id)."""
+    consent = consent_cache.get_consent(db, log.user_id, log.patient_id)
+    authorized, reason = _decide(consent, log.action)
+
+    entry = crud.log_access(db, log, authorized, wait=wait)
+    event_bus.publish("access", _access_event(entry.id, log, authorized, entry.timestamp))
+    return authorized, reason, entry.id
+
 
-    crud.log_access(db, log, authorized)
+def _alert(log: schemas.AccessLogBase, reason: str, log_id: int):
+    """Dispatcher submit with its synchronous fallback, on a session of its own (threadpool)."""
+    db = SessionLocal()
+    try:
+        alert_dispatcher.submit(log.user_id, log.patient_id, reason, db=db, access_log_id=log_id)
+    finally:
+        db.close()
 
+
+def _respond(authorized: bool, reason: str):
     if not authorized:
-        user = db.query(models.User).filter_by(id=log.user_id).first()
-        patient = db.query(models.Patient).filter_by(id=log.patient_id).first()
-        log_alert(log.user_id, log.patient_id, reason, db=db)
-        send_breach_alert(
-            user_name=user.name if user else f"User #{log.user_id}",
-            patient_name=patient.name if patient else f"Patient #{log.patient_id}",
-            reason=reason
-        )
         raise HTTPException(status_code=403, detail=f"Access denied. {reason}")
-
     return {"message": "Access granted", "authorized": True}
+
+
+def access_patient_record(log: schemas.AccessLogBase, db: Session = Depends(get_db)):
+    authorized, reason, log_id = _check_and_log(db, log)
+    if not authorized:
+        # Alert persistence and notification happen on the dispatcher workers.
+        alert_dispatcher.submit(log.user_id, log.patient_id, reason, db=db, access_log_id=log_id)
+    return _respond(authorized, reason)
+
+
+async def access_patient_record_async(log: schemas.AccessLogBase, db: AsyncSession = Depends(get_async_db)):
+    """
+    Same decision path as the sync handler, run on the async connection with
+    AsyncSession.run_sync so the request holds no threadpool slot while it
+    waits on the database.
+
+    run_sync executes on the event loop, so nothing in it may block outside
+    the driver: a full log buffer is bypassed with a direct insert, and a
+    denial the dispatcher cannot queue falls back to the threadpool.
+    """
+    authorized, reason, log_id = await db.run_sync(_check_and_log, log, False)
+    if not authorized and not alert_dispatcher.offer(log.user_id, log.patient_id, reason, log_id):
+        await run_in_threadpool(_alert, log, reason, log_id)
+    return _respond(authorized, reason)
+
+
+router.add_api_route(
+    "/", access_patient_record_async if ASYNC_ENDPOINTS else access_patient_record,
+    methods=["POST"], name="access_patient_record"
+)
+
+
+@router.post("/batch", response_model=schemas.AccessBatchResponse)
+def access_patient_records_batch(batch: schemas.AccessBatchRequest, db: Session = Depends(get_db)):
+    """
+    Evaluates many (user, patient, action) checks in one transaction.
+    Consents are resolved with a single IN query, access logs and alerts are
+    bulk-inserted, and a decision is returned per item instead of a 403.
+    Breach notifications are queued on the alert dispatcher.
+    """
+    items = batch.items
+    consents = consent_cache.get_consents(db, {(i.user_id, i.patient_id) for i in items})
+
+    results = []
+    denials = []
+    for item in items:
+        authorized, reason = _decide(consents[(item.user_id, item.patient_id)], item.action)
+        results.append(schemas.AccessDecision(
+            user_id=item.user_id, patient_id=item.patient_id, action=item.action,
+            authorized=authorized, reason=reason or None
+        ))
+        if not authorized:
+            denials.append((item.user_id, item.patient_id, reason))
+
+    log_ids = crud.log_access_many(db, [(i, r.authorized) for i, r in zip(items, results)], commit=False)
+    denied_log_ids = [log_id for log_id, r in zip(log_ids, results) if not r.authorized]
+    alert_rows = log_alerts([d + (log_id,) for d, log_id in zip(denials, denied_log_ids)], db, commit=False)
+    db.commit()
+
+    now = datetime.utcnow()
+    for item, result, log_id in zip(items, results, log_ids):
+        event_bus.publish("access", _access_event(log_id, item, result.authorized, now))
+    for row in alert_rows:
+        event_bus.publish("alert", row)
+
+    # The alerts are committed with the logs; the dispatcher only notifies.
+    for (user_id, patient_id, reason), log_id in zip(denials, denied_log_ids):
+        alert_dispatcher.submit_persisted(user_id, patient_id, reason, db=db, access_log_id=log_id)
+
+    return {
+        "granted": len(items) - len(denials),
+        "denied": len(denials),
+        "results": results,
+    }
+
+
+@router.get("/cache/stats")
+def consent_cache_stats():
+    """Hit/miss/eviction counters for the consent and display-name caches."""
+    return consent_cache.stats()
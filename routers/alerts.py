@@ -1,26 +1,61 @@
 # routers/alerts.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import inspect
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
+from typing import Optional
 import models, schemas, crud
-from database import get_db
+from database import ASYNC_ENDPOINTS, get_async_db, get_db
+import alert_dispatcher
+import event_bus
+from pagination import paginate
 
 router = APIRouter(prefix="/alerts", tags=["Alerts"])
 
 # ------------------ List Alerts ------------------
-@router.get("/")
 def get_alerts(
+    response: Response,
     db: Session = Depends(get_db),
     limit: int = 50,
-    unresolved_only: bool = False
+    unresolved_only: bool = False,
+    cursor: Optional[str] = None
 ):
     """
-    Returns a list of alerts (optionally unresolved only).
+    Returns a page of alerts, newest first (optionally unresolved only).
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
     """
-    q = db.query(models.Alert).order_by(models.Alert.created_at.desc())
+    q = db.query(models.Alert).options(joinedload(models.Alert.user), joinedload(models.Alert.patient))
     if unresolved_only:
         q = q.filter(models.Alert.resolved == False)
-    return q.limit(limit).all()
+    return paginate(q, models.Alert.created_at, models.Alert.id, limit, cursor, response)
+
+
+async def get_alerts_async(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = 50,
+    unresolved_only: bool = False,
+    cursor: Optional[str] = None
+):
+    """Async twin of get_alerts (ASYNC_ENDPOINTS=1)."""
+    return await db.run_sync(lambda s: get_alerts(response, s, limit, unresolved_only, cursor))
+
+
+router.add_api_route(
+    "/", get_alerts_async if ASYNC_ENDPOINTS else get_alerts,
+    methods=["GET"], name="get_alerts", description=inspect.cleandoc(get_alerts.__doc__)
+)
+
+
+# ------------------ Dispatcher Stats ------------------
+@router.get("/dispatcher/stats")
+def get_dispatcher_stats():
+    """
+    Queue depth, dispatch latency and failure counts for the background
+    alert dispatcher.
+    """
+    return alert_dispatcher.dispatcher.stats()
 
 
 # ------------------ Create Alert (for testing/demo) ------------------
@@ -53,4 +88,5 @@ def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Alert not found.")
     alert.resolved = True
     db.commit()
+    event_bus.publish("alert_resolved", {"id": alert_id, "user_id": alert.user_id, "patient_id": alert.patient_id})
     return {"message": "Alert resolved", "alert_id": alert_id}
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 import models, schemas, crud
 from database import get_db
+from bulk_ingest import ingest_request
 
 router = APIRouter(prefix="/consents", tags=["Consents"])
 
@@ -12,3 +13,12 @@ def create_consent(consent: schemas.ConsentCreate, db: Session = Depends(get_db)
 @router.get("/", response_model=list[schemas.ConsentResponse])
 def get_consents(db: Session = Depends(get_db)):
     return crud.get_consents(db)
+
+
+@router.post("/bulk")
+async def bulk_create_consents(request: Request, db: Session = Depends(get_db)):
+    """
+    Bulk-load consent grants from a JSON array or a streamed CSV body
+    (Content-Type: text/csv). Returns per-row conflicts.
+    """
+    return await ingest_request(request, db, "consents")
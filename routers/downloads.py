@@ -0,0 +1,185 @@
+# routers/downloads.py
+"""
+Dashboard table downloads (access logs, alerts, consent grants) as CSV,
+XLSX or Parquet, generated when requested instead of on every dashboard
+rerun.
+
+Rows are read in EXPORT_BATCH_ROWS batches by a generator that owns its
+session. CSV streams as it is encoded. XLSX and Parquet are written to a
+temporary file (xlsxwriter in constant_memory mode, pyarrow one row group
+per batch) and then streamed from disk, so neither the API nor the
+dashboard holds the whole encoded file in memory. The encoders are
+imported on first use to keep them out of start-up. An XLSX worksheet holds
+at most XLSX_MAX_ROWS rows, so longer downloads continue on further sheets
+(data, data_2, ...).
+"""
+import itertools
+import tempfile
+from datetime import datetime, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from sqlalchemy import or_
+
+import models
+from database import SessionLocal
+from routers.exports import EXPORT_BATCH_ROWS, EXPORT_CHUNK_BYTES, _csv_chunks, _window_rows
+
+router = APIRouter(prefix="/download", tags=["Downloads"])
+
+Format = Literal["csv", "xlsx", "parquet"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# (header, type) per column; the type drives XLSX cell formats and the Parquet schema.
+LOG_COLUMNS = [("Timestamp", "datetime"), ("User", "str"), ("Patient", "str"), ("Action", "str"), ("Authorized", "bool")]
+ALERT_COLUMNS = [
+    ("id", "int"), ("created_at", "datetime"), ("user_id", "int"), ("patient_id", "int"),
+    ("access_log_id", "int"), ("message", "str"), ("resolved", "bool"),
+]
+XLSX_MAX_ROWS = 1_048_576  # per worksheet, header included
+
+CONSENT_COLUMNS = [("User", "str"), ("Role", "str"), ("Patient", "str"), ("Can View", "bool"), ("Can Edit", "bool")]
+
+
+# ---------------- Encoders ----------------
+def _file_chunks(f):
+    f.seek(0)
+    while True:
+        chunk = f.read(EXPORT_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _xlsx_chunks(columns, rows):
+    import xlsxwriter
+
+    with tempfile.TemporaryFile() as f:
+        workbook = xlsxwriter.Workbook(f, {"constant_memory": True})
+        date_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        dates = {i for i, (_, kind) in enumerate(columns) if kind == "datetime"}
+        sheets = 0
+        r = XLSX_MAX_ROWS
+        for row in rows:
+            if r == XLSX_MAX_ROWS:
+                sheets += 1
+                sheet = workbook.add_worksheet("data" if sheets == 1 else f"data_{sheets}")
+                sheet.write_row(0, 0, [name for name, _ in columns])
+                r = 1
+            for c, value in enumerate(row):
+                if c in dates and value is not None:
+                    sheet.write_datetime(r, c, value, date_format)
+                else:
+                    sheet.write(r, c, value)
+            r += 1
+        if not sheets:
+            workbook.add_worksheet("data").write_row(0, 0, [name for name, _ in columns])
+        workbook.close()
+        yield from _file_chunks(f)
+
+
+def _parquet_chunks(columns, rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"datetime": pa.timestamp("us"), "int": pa.int64(), "str": pa.string(), "bool": pa.bool_()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    rows = iter(rows)
+    with tempfile.TemporaryFile() as f:
+        with pq.ParquetWriter(f, schema) as writer:
+            while True:
+                batch = list(itertools.islice(rows, EXPORT_BATCH_ROWS))
+                if not batch:
+                    break
+                writer.write_table(pa.Table.from_pylist([dict(zip(schema.names, row)) for row in batch], schema=schema))
+        yield from _file_chunks(f)
+
+
+def _download(name: str, columns, rows, fmt: str) -> StreamingResponse:
+    if fmt == "xlsx":
+        body = _xlsx_chunks(columns, rows)
+    elif fmt == "parquet":
+        body = _parquet_chunks(columns, rows)
+    else:
+        body = _csv_chunks([name for name, _ in columns], rows)
+    return StreamingResponse(
+        body, media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={name}.{fmt}"}
+    )
+
+
+# ---------------- Row sources ----------------
+def iter_log_rows(since_ts: datetime, limit: Optional[int] = None, session_factory=SessionLocal):
+    """The dashboard's access-log table: newest first, names resolved."""
+    db = session_factory()
+    try:
+        rows = _window_rows(db, since_ts)
+        if limit:
+            rows = itertools.islice(rows, limit)
+        for ts, user_id, patient_id, action, is_authorized, user_name, role, patient_name in rows:
+            yield [
+                ts,
+                f"{user_name} ({role})" if user_name is not None else str(user_id),
+                f"{patient_name} [#{patient_id}]" if patient_name is not None else str(patient_id),
+                action,
+                bool(is_authorized),
+            ]
+    finally:
+        db.close()
+
+
+def iter_alert_rows(limit: Optional[int] = None, unresolved_only: bool = False, session_factory=SessionLocal):
+    db = session_factory()
+    try:
+        A = models.Alert
+        q = db.query(A.id, A.created_at, A.user_id, A.patient_id, A.access_log_id, A.message, A.resolved)
+        if unresolved_only:
+            q = q.filter(A.resolved == False)
+        q = q.order_by(A.created_at.desc(), A.id.desc())
+        if limit:
+            q = q.limit(limit)
+        for row in q.execution_options(yield_per=EXPORT_BATCH_ROWS):
+            yield [*row[:6], bool(row.resolved)]
+    finally:
+        db.close()
+
+
+def iter_consent_rows(session_factory=SessionLocal):
+    """Existing grants, as in /consent-matrix?sparse=true."""
+    db = session_factory()
+    try:
+        q = db.query(
+            models.User.name, models.User.role, models.Patient.name,
+            models.Consent.can_view, models.Consent.can_edit
+        ).join(models.User, models.User.id == models.Consent.user_id
+        ).join(models.Patient, models.Patient.id == models.Consent.patient_id
+        ).filter(or_(models.Consent.can_view == True, models.Consent.can_edit == True)
+        ).order_by(models.Consent.id)
+        for user_name, role, patient_name, can_view, can_edit in q.execution_options(yield_per=EXPORT_BATCH_ROWS):
+            yield [user_name, role, patient_name, bool(can_view), bool(can_edit)]
+    finally:
+        db.close()
+
+
+# ---------------- Endpoints ----------------
+@router.get("/logs")
+def download_logs(format: Format = "csv", since_minutes: int = 1440, limit: Optional[int] = None):
+    """Access logs in the window, newest first; `limit` caps the row count (default: the whole window)."""
+    since_ts = datetime.utcnow() - timedelta(minutes=since_minutes)
+    return _download("access_logs", LOG_COLUMNS, iter_log_rows(since_ts, limit), format)
+
+
+@router.get("/alerts")
+def download_alerts(format: Format = "csv", limit: Optional[int] = None, unresolved_only: bool = False):
+    return _download("alerts", ALERT_COLUMNS, iter_alert_rows(limit, unresolved_only), format)
+
+
+@router.get("/consents")
+def download_consents(format: Format = "csv"):
+    return _download("consent_matrix", CONSENT_COLUMNS, iter_consent_rows(), format)
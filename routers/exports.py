@@ -1,62 +1,109 @@
 # routers/exports.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter
 from datetime import datetime, timedelta
 from fastapi.responses import StreamingResponse
 from io import StringIO
 import csv
-from database import get_db
+from database import SessionLocal
 import models
-from anonymize import mask_name, mask_user, generalize_dob, hash_record_id
+import partitions
+from anonymize import pseudonymizer
 
 router = APIRouter(prefix="/export/anonymized", tags=["Anonymized Exports"])
 
-@router.get("/patients")
-def export_anonymized_patients(db: Session = Depends(get_db)):
-    patients = db.query(models.Patient).all()
+# Rows fetched per round trip (server-side cursor on Postgres) and the size of
+# each CSV chunk handed to the response. Memory stays flat in both.
+EXPORT_BATCH_ROWS = 5000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _csv_chunks(header, rows):
+    """Encode `rows` as CSV, yielding roughly EXPORT_CHUNK_BYTES at a time."""
     buf = StringIO()
     writer = csv.writer(buf)
-    writer.writerow(["patient_id", "pseudonym", "dob_year", "record_hash"])
-    for p in patients:
-        writer.writerow([
-            p.id,
-            mask_name(p.name),
-            generalize_dob(p.dob or ""),
-            hash_record_id(p.record_id or f"{p.id}")
-        ])
-    buf.seek(0)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= EXPORT_CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def iter_anonymized_patients(session_factory=SessionLocal):
+    # The generator owns its session: it keeps reading after the request
+    # dependencies have been torn down.
+    db = session_factory()
+    try:
+        rows = db.query(
+            models.Patient.id, models.Patient.name, models.Patient.dob, models.Patient.record_id
+        ).order_by(models.Patient.id).execution_options(yield_per=EXPORT_BATCH_ROWS)
+        yield from _csv_chunks(
+            ["patient_id", "pseudonym", "dob_year", "record_hash"],
+            (
+                [
+                    pid,
+                    pseudonymizer.mask_name(name),
+                    pseudonymizer.generalize_dob(dob or ""),
+                    pseudonymizer.hash_record_id(record_id or f"{pid}"),
+                ]
+                for pid, name, dob, record_id in rows
+            ),
+        )
+    finally:
+        db.close()
+
+
+def _window_rows(db, since_ts: datetime):
+    # Newest first: the live table, then each monthly partition the window reaches.
+    for AL in partitions.log_entities(db, since_ts):
+        yield from db.query(
+            AL.timestamp, AL.user_id, AL.patient_id, AL.action, AL.is_authorized,
+            models.User.name, models.User.role, models.Patient.name,
+        ).outerjoin(models.User, models.User.id == AL.user_id
+        ).outerjoin(models.Patient, models.Patient.id == AL.patient_id
+        ).filter(AL.timestamp >= since_ts
+        ).order_by(AL.timestamp.desc()
+        ).execution_options(yield_per=EXPORT_BATCH_ROWS)
+
+
+def iter_anonymized_logs(since_ts: datetime, session_factory=SessionLocal):
+    db = session_factory()
+    try:
+        rows = _window_rows(db, since_ts)
+        yield from _csv_chunks(
+            ["timestamp_utc", "user_pseudonym", "patient_pseudonym", "action", "authorized"],
+            (
+                [
+                    ts.strftime("%Y-%m-%d %H:%M:%S"),
+                    pseudonymizer.mask_user(
+                        user_name if user_name is not None else f"User{user_id}",
+                        role if user_name is not None else "user",
+                    ),
+                    pseudonymizer.mask_name(patient_name if patient_name is not None else f"Patient{patient_id}"),
+                    action,
+                    "True" if is_authorized else "False",
+                ]
+                for ts, user_id, patient_id, action, is_authorized, user_name, role, patient_name in rows
+            ),
+        )
+    finally:
+        db.close()
+
+
+@router.get("/patients")
+def export_anonymized_patients():
     return StreamingResponse(
-        buf, media_type="text/csv",
+        iter_anonymized_patients(), media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=anonymized_patients.csv"}
     )
 
 @router.get("/logs")
-def export_anonymized_logs(
-    db: Session = Depends(get_db),
-    since_minutes: int = 1440
-):
+def export_anonymized_logs(since_minutes: int = 1440):
     since_ts = datetime.utcnow() - timedelta(minutes=since_minutes)
-    logs = db.query(models.AccessLog).filter(models.AccessLog.timestamp >= since_ts).order_by(models.AccessLog.timestamp.desc()).all()
-    users = {u.id: u for u in db.query(models.User).all()}
-    pats = {p.id: p for p in db.query(models.Patient).all()}
-
-    buf = StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(["timestamp_utc", "user_pseudonym", "patient_pseudonym", "action", "authorized"])
-    for lg in logs:
-        u = users.get(lg.user_id)
-        p = pats.get(lg.patient_id)
-        user_pseudo = mask_user(u.name if u else f"User{lg.user_id}", u.role if u else "user")
-        patient_pseudo = mask_name(p.name if p else f"Patient{lg.patient_id}")
-        writer.writerow([
-            lg.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            user_pseudo,
-            patient_pseudo,
-            lg.action,
-            "True" if lg.is_authorized else "False"
-        ])
-    buf.seek(0)
     return StreamingResponse(
-        buf, media_type="text/csv",
+        iter_anonymized_logs(since_ts), media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=anonymized_access_logs.csv"}
     )
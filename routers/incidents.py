@@ -1,8 +1,8 @@
 # routers/incidents.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from datetime import timedelta
 import models
+import partitions
 from database import get_db
 from anonymize import summarize_incident
 
@@ -10,40 +10,51 @@ router = APIRouter(prefix="", tags=["Incident Summaries"])
 
 @router.get("/incidents/summaries")
 def incident_summaries(db: Session = Depends(get_db), limit: int = 10):
-    alerts = db.query(models.Alert).order_by(models.Alert.created_at.desc()).limit(limit).all()
-    summaries = []
-    for a in alerts:
-        window_start = a.created_at - timedelta(minutes=5)
-        window_end = a.created_at + timedelta(minutes=5)
-        log = db.query(models.AccessLog).filter(
-            models.AccessLog.timestamp >= window_start,
-            models.AccessLog.timestamp <= window_end,
-            models.AccessLog.is_authorized == False
-        ).order_by(models.AccessLog.timestamp.desc()).first()
+    """
+    Narrative summaries of the most recent alerts, built from a single query
+    joining each alert to the access log that triggered it.
+    """
+    AL = models.AccessLog
+    rows = db.query(
+        models.Alert.created_at, models.Alert.message, models.Alert.resolved, models.Alert.access_log_id,
+        AL.id, AL.user_id, AL.patient_id, AL.action, AL.timestamp,
+        models.User.name, models.User.role, models.Patient.name,
+    ).outerjoin(AL, AL.id == models.Alert.access_log_id
+    ).outerjoin(models.User, models.User.id == AL.user_id
+    ).outerjoin(models.Patient, models.Patient.id == AL.patient_id
+    ).order_by(models.Alert.created_at.desc(), models.Alert.id.desc()
+    ).limit(limit).all()
+
+    # Alerts whose access log has been sealed into a monthly partition.
+    sealed = partitions.find_logs(db, {r[3] for r in rows if r[3] is not None and r[4] is None})
+    if sealed:
+        users = {u.id: u for u in db.query(models.User.id, models.User.name, models.User.role).filter(
+            models.User.id.in_({log.user_id for log in sealed.values()}))}
+        patients = dict(db.query(models.Patient.id, models.Patient.name).filter(
+            models.Patient.id.in_({log.patient_id for log in sealed.values()})))
+        for i, row in enumerate(rows):
+            log = sealed.get(row[3]) if row[4] is None else None
+            if log is not None:
+                user = users.get(log.user_id)
+                rows[i] = tuple(row[:4]) + (
+                    log.id, log.user_id, log.patient_id, log.action, log.timestamp,
+                    user.name if user else None, user.role if user else None, patients.get(log.patient_id),
+                )
 
-        if log:
-            u = db.query(models.User).filter_by(id=log.user_id).first()
-            p = db.query(models.Patient).filter_by(id=log.patient_id).first()
+    summaries = []
+    for (created_at, message, resolved, _, log_id, user_id, patient_id, action, ts,
+         user_name, user_role, patient_name) in rows:
+        if log_id is not None:
             summary = summarize_incident(
-                user_name=(u.name if u else f"User #{log.user_id}"),
-                user_role=(u.role if u else "user"),
-                patient_name=(p.name if p else f"Patient #{log.patient_id}"),
-                action=log.action,
-                reason=a.message.replace("Unauthorized access by", "Reason for"),
-                when_utc=log.timestamp
+                user_name=(user_name if user_name is not None else f"User #{user_id}"),
+                user_role=(user_role if user_name is not None else "user"),
+                patient_name=(patient_name if patient_name is not None else f"Patient #{patient_id}"),
+                action=action,
+                reason=message.replace("Unauthorized access by", "Reason for"),
+                when_utc=ts
             )
         else:
-            summary = f"Alert at {a.created_at.strftime('%Y-%m-%d %H:%M UTC')}: {a.message}"
+            summary = f"Alert at {created_at.strftime('%Y-%m-%d %H:%M UTC')}: {message}"
 
-        summaries.append({"created_at": a.created_at, "summary": summary, "resolved": a.resolved})
+        summaries.append({"created_at": created_at, "summary": summary, "resolved": resolved})
     return summaries
-
-
-@router.patch("/alerts/{alert_id}/resolve")
-def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
-    alert = db.query(models.Alert).filter_by(id=alert_id).first()
-    if not alert:
-        raise HTTPException(status_code=404, detail="Alert not found.")
-    alert.resolved = True
-    db.commit()
-    return {"message": "Alert resolved", "alert_id": alert_id}
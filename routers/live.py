@@ -0,0 +1,129 @@
+# routers/live.py
+import json
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+import event_bus
+from event_bus import FEED_HEARTBEAT_SECONDS, FEED_METRICS_SECONDS, KINDS
+
+router = APIRouter(prefix="/live", tags=["Live Feed"])
+
+
+def _parse_kinds(kinds: Optional[str]) -> tuple:
+    if not kinds:
+        return KINDS
+    requested = tuple(k.strip() for k in kinds.split(",") if k.strip())
+    unknown = set(requested) - set(KINDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown event kinds: {', '.join(sorted(unknown))}.")
+    return requested
+
+
+async def _frames(sub):
+    """
+    Yield (kind, event_id, json payload) until the subscriber is dropped.
+    A (None, None, None) frame is a heartbeat after FEED_HEARTBEAT_SECONDS of silence.
+    """
+    wants_metrics = "metrics" in sub.kinds
+    timeout = min(FEED_METRICS_SECONDS, FEED_HEARTBEAT_SECONDS) if wants_metrics else FEED_HEARTBEAT_SECONDS
+    last_metrics = last_frame = time.monotonic()
+    while True:
+        batch = await sub.next_batch(timeout)
+        for event in batch:
+            yield event["event"], event["id"], event["json"]
+        now = time.monotonic()
+        if batch:
+            last_frame = now
+        if wants_metrics and now - last_metrics >= FEED_METRICS_SECONDS:
+            last_metrics = now
+            deltas = sub.take_deltas()
+            if deltas:
+                last_frame = now
+                yield "metrics", None, json.dumps(deltas)
+        if sub.dropped:
+            yield "dropped", None, json.dumps({"reason": "buffer full", "buffer_size": sub.maxsize})
+            return
+        if now - last_frame >= FEED_HEARTBEAT_SECONDS:
+            last_frame = now
+            yield None, None, None
+
+
+# ------------------ Server-Sent Events ------------------
+@router.get("/events")
+async def live_events(
+    user_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    action: Optional[str] = None,
+    kinds: Optional[str] = None
+):
+    """
+    Server-Sent Events stream of access decisions, alerts, alert resolutions
+    and per-second counter deltas (`metrics`), optionally filtered by user,
+    patient, action and comma-separated event kinds. Slow clients are
+    disconnected with a final `dropped` event.
+    """
+    filters = {"user_id": user_id, "patient_id": patient_id, "action": action, "kinds": _parse_kinds(kinds)}
+    if event_bus.bus.full():
+        raise HTTPException(status_code=503, detail="Too many live feed subscribers.")
+
+    async def stream():
+        sub = event_bus.bus.subscribe(**filters)
+        if sub is None:
+            yield "event: dropped\ndata: {\"reason\": \"too many subscribers\"}\n\n"
+            return
+        try:
+            yield ": connected\n\n"
+            async for kind, event_id, payload in _frames(sub):
+                if kind is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield (f"id: {event_id}\n" if event_id else "") + f"event: {kind}\ndata: {payload}\n\n"
+        finally:
+            event_bus.bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ------------------ WebSocket ------------------
+@router.websocket("/ws")
+async def live_ws(
+    websocket: WebSocket,
+    user_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    action: Optional[str] = None,
+    kinds: Optional[str] = None
+):
+    """Same feed as /live/events, one JSON message per event."""
+    try:
+        parsed_kinds = _parse_kinds(kinds)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    await websocket.accept()
+    sub = event_bus.bus.subscribe(user_id=user_id, patient_id=patient_id, action=action, kinds=parsed_kinds)
+    if sub is None:
+        await websocket.close(code=1013, reason="Too many live feed subscribers.")
+        return
+    try:
+        async for kind, event_id, payload in _frames(sub):
+            kind = kind or "heartbeat"
+            await websocket.send_text(
+                f'{{"event": "{kind}", "id": {json.dumps(event_id)}, "data": {payload or "null"}}}'
+            )
+        await websocket.close(code=1008, reason="Dropped: buffer full.")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        event_bus.bus.unsubscribe(sub)
+
+
+@router.get("/stats")
+def live_stats():
+    """Subscriber count, buffered events and drops for the live feed bus."""
+    return event_bus.bus.stats()
@@ -1,78 +1,147 @@
 # routers/metrics.py
-from fastapi import APIRouter, Depends
+import inspect
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Optional
-from datetime import datetime, timedelta
-from sqlalchemy import func, case
+from typing import Literal, Optional
+from datetime import datetime, timedelta, timezone
+import instrumentation
+import log_buffer
 import models
-from database import get_db
+import partitions
+import rollups
+from database import ASYNC_ENDPOINTS, get_async_db, get_db
+from pagination import decode_cursor, paginate_by_id, paginate_many, rows_after
+from consent_index import index as consent_index
+from routers.alerts import get_alerts, get_alerts_async
 
 router = APIRouter(prefix="", tags=["Metrics & Logs"])
 
 # ------------------ Logs ------------------
-@router.get("/logs")
 def get_logs(
+    response: Response,
     db: Session = Depends(get_db),
     limit: int = 100,
     user_id: Optional[int] = None,
     patient_id: Optional[int] = None,
     action: Optional[str] = None,
-    since_minutes: int = 1440
+    since_minutes: int = 1440,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    after_ts: Optional[datetime] = None
 ):
-    q = db.query(models.AccessLog)
-    if user_id:
-        q = q.filter(models.AccessLog.user_id == user_id)
-    if patient_id:
-        q = q.filter(models.AccessLog.patient_id == patient_id)
-    if action:
-        q = q.filter(models.AccessLog.action == action)
+    """
+    Access logs, newest first. Pass the X-Next-Cursor response header back as
+    `cursor` to read the next page.
+
+    With `after_id` and/or `after_ts` only rows newer than that watermark are
+    returned, oldest first, for clients that tail the log. Prefer `after_id`:
+    ids only grow, so rows ingested late with older timestamps are not missed.
+    """
+    tailing = after_id is not None or after_ts is not None
+    if tailing and cursor:
+        raise HTTPException(status_code=400, detail="cursor cannot be combined with after_id/after_ts.")
+    if after_ts is not None and after_ts.tzinfo is not None:
+        after_ts = after_ts.astimezone(timezone.utc).replace(tzinfo=None)
+
     since_ts = datetime.utcnow() - timedelta(minutes=since_minutes)
-    q = q.filter(models.AccessLog.timestamp >= since_ts)
-    q = q.order_by(models.AccessLog.timestamp.desc()).limit(limit)
-    return q.all()
+    until_ts = decode_cursor(cursor)[0] if cursor else None
+    sources = []
+    # The live table first, then only the monthly partitions the window reaches.
+    for log in partitions.log_entities(db, max(since_ts, after_ts) if after_ts else since_ts, until_ts):
+        q = db.query(log).filter(log.timestamp >= since_ts)
+        if user_id:
+            q = q.filter(log.user_id == user_id)
+        if patient_id:
+            q = q.filter(log.patient_id == patient_id)
+        if action:
+            q = q.filter(log.action == action)
+        sources.append((q, log.timestamp, log.id))
+    if tailing:
+        return rows_after(sources, limit, after_id, after_ts)
+    return paginate_many(sources, limit, cursor, response)
 
 
-# ------------------ Alerts ------------------
-@router.get("/alerts")
-def get_alerts(
-    db: Session = Depends(get_db),
-    limit: int = 50,
-    unresolved_only: bool = False
+async def get_logs_async(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = 100,
+    user_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    action: Optional[str] = None,
+    since_minutes: int = 1440,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    after_ts: Optional[datetime] = None
 ):
-    q = db.query(models.Alert).order_by(models.Alert.created_at.desc())
-    if unresolved_only:
-        q = q.filter(models.Alert.resolved == False)
-    return q.limit(limit).all()
+    """Async twin of get_logs (ASYNC_ENDPOINTS=1)."""
+    return await db.run_sync(
+        lambda s: get_logs(response, s, limit, user_id, patient_id, action, since_minutes, cursor, after_id, after_ts)
+    )
+
+
+router.add_api_route(
+    "/logs", get_logs_async if ASYNC_ENDPOINTS else get_logs,
+    methods=["GET"], name="get_logs", description=inspect.cleandoc(get_logs.__doc__)
+)
+
+
+@router.get("/logs/partitions")
+def get_log_partitions(db: Session = Depends(get_db)):
+    """Sealed, archived and dropped monthly access-log partitions, plus maintenance status."""
+    P = models.AccessLogPartition
+    rows = db.query(P).order_by(P.range_start.desc()).all()
+    return {
+        "live_rows": db.query(models.AccessLog).count(),
+        "partitions": [
+            {"month": p.month, "table": p.table_name, "status": p.status, "rows": p.rows,
+             "archive_path": p.archive_path, "sealed_at": p.sealed_at, "retired_at": p.retired_at}
+            for p in rows
+        ],
+        "maintenance": partitions.maintainer.stats(),
+    }
+
+
+@router.get("/logs/buffer/stats")
+def get_log_buffer_stats():
+    """
+    Rows waiting in the access-log group-commit buffer (ACCESS_LOG_MODE=buffered)
+    and the age of the oldest -- what a crash would lose right now.
+    """
+    return log_buffer.buffer.stats()
+
+
+# ------------------ Alerts ------------------
+# Same handler as GET /alerts/ in routers/alerts.py, also served at /alerts.
+router.add_api_route(
+    "/alerts", get_alerts_async if ASYNC_ENDPOINTS else get_alerts,
+    methods=["GET"], name="get_alerts", description=inspect.cleandoc(get_alerts.__doc__)
+)
 
 
 # ------------------ Metrics Overview ------------------
-@router.get("/metrics/overview")
 def metrics_overview(
     db: Session = Depends(get_db),
     since_minutes: int = 1440
 ):
+    """
+    Window totals and the hourly trend, answered from the access_rollups table
+    (see rollups.py) in time proportional to the number of hourly buckets.
+    """
     since_ts = datetime.utcnow() - timedelta(minutes=since_minutes)
-    total = db.query(models.AccessLog).filter(models.AccessLog.timestamp >= since_ts).count()
-    authorized = db.query(models.AccessLog).filter(
-        models.AccessLog.timestamp >= since_ts,
-        models.AccessLog.is_authorized == True
-    ).count()
-    breaches = db.query(models.AccessLog).filter(
-        models.AccessLog.timestamp >= since_ts,
-        models.AccessLog.is_authorized == False
-    ).count()
+    hourly = rollups.hourly_series(db, since_ts)
+    authorized = sum(r[1] for r in hourly)
+    breaches = sum(r[2] for r in hourly)
+    total = authorized + breaches
     alerts_open = db.query(models.Alert).filter(models.Alert.resolved == False).count()
     compliance = round((authorized / total) * 100, 2) if total else 100.0
 
-    rows = db.query(
-        func.strftime('%Y-%m-%d %H:00:00', models.AccessLog.timestamp).label("bucket"),
-        func.sum(case((models.AccessLog.is_authorized == True, 1), else_=0)).label("authorized"),
-        func.sum(case((models.AccessLog.is_authorized == False, 1), else_=0)).label("breaches")
-    ).filter(models.AccessLog.timestamp >= since_ts
-    ).group_by("bucket"
-    ).order_by("bucket").all()
-
-    series = [{"bucket": r[0], "authorized": int(r[1] or 0), "breaches": int(r[2] or 0)} for r in rows]
+    series = [
+        {"bucket": bucket.strftime("%Y-%m-%d %H:00:00"), "authorized": auth, "breaches": breach}
+        for bucket, auth, breach in hourly
+    ]
 
     return {
         "since_minutes": since_minutes,
@@ -85,11 +154,71 @@ def metrics_overview(
     }
 
 
+async def metrics_overview_async(
+    db: AsyncSession = Depends(get_async_db),
+    since_minutes: int = 1440
+):
+    """Async twin of metrics_overview (ASYNC_ENDPOINTS=1)."""
+    return await db.run_sync(metrics_overview, since_minutes)
+
+
+router.add_api_route(
+    "/metrics/overview", metrics_overview_async if ASYNC_ENDPOINTS else metrics_overview,
+    methods=["GET"], name="metrics_overview", description=inspect.cleandoc(metrics_overview.__doc__)
+)
+
+
 # ------------------ Consent Matrix ------------------
 @router.get("/consent-matrix")
-def consent_matrix(db: Session = Depends(get_db)):
-    users = db.query(models.User).all()
-    patients = db.query(models.Patient).all()
+def consent_matrix(
+    response: Response,
+    db: Session = Depends(get_db),
+    sparse: bool = False,
+    user_id: Optional[int] = None,
+    role: Optional[str] = None,
+    patient_id: Optional[int] = None,
+    limit: int = 1000,
+    cursor: Optional[str] = None
+):
+    """
+    Who can view/edit whom. The default dense mode returns every
+    users x patients cell; `sparse=true` returns only existing grants, one
+    page at a time (X-Next-Cursor header), without building the product.
+    """
+    if sparse:
+        q = db.query(
+            models.Consent.id, models.Consent.user_id, models.User.name, models.User.role,
+            models.Consent.patient_id, models.Patient.name,
+            models.Consent.can_view, models.Consent.can_edit
+        ).join(models.User, models.User.id == models.Consent.user_id
+        ).join(models.Patient, models.Patient.id == models.Consent.patient_id
+        ).filter(or_(models.Consent.can_view == True, models.Consent.can_edit == True))
+        if user_id:
+            q = q.filter(models.Consent.user_id == user_id)
+        if role:
+            q = q.filter(models.User.role == role)
+        if patient_id:
+            q = q.filter(models.Consent.patient_id == patient_id)
+        rows = paginate_by_id(q, models.Consent.id, limit, cursor, response)
+        return [
+            {
+                "user_id": uid, "user_name": user_name, "role": user_role,
+                "patient_id": pid, "patient_name": patient_name,
+                "can_view": bool(can_view), "can_edit": bool(can_edit)
+            }
+            for _, uid, user_name, user_role, pid, patient_name, can_view, can_edit in rows
+        ]
+
+    users_q = db.query(models.User.id, models.User.name, models.User.role)
+    if user_id:
+        users_q = users_q.filter(models.User.id == user_id)
+    if role:
+        users_q = users_q.filter(models.User.role == role)
+    patients_q = db.query(models.Patient.id, models.Patient.name)
+    if patient_id:
+        patients_q = patients_q.filter(models.Patient.id == patient_id)
+    users = users_q.all()
+    patients = patients_q.all()
     consents = db.query(models.Consent).all()
     key = {(c.user_id, c.patient_id): c for c in consents}
 
@@ -104,3 +233,38 @@ def consent_matrix(db: Session = Depends(get_db)):
                 "can_edit": bool(c.can_edit) if c else False
             })
     return matrix
+
+
+@router.get("/consent-matrix/check")
+def consent_check(user_id: int, patient_id: int, db: Session = Depends(get_db)):
+    """Answered from the in-memory consent index, not the consents table."""
+    return {
+        "user_id": user_id,
+        "patient_id": patient_id,
+        "can_view": consent_index.can(db, user_id, patient_id, "view"),
+        "can_edit": consent_index.can(db, user_id, patient_id, "edit"),
+    }
+
+
+@router.get("/consent-matrix/patients/{patient_id}/users")
+def users_with_access(patient_id: int, permission: Literal["view", "edit"] = "view", db: Session = Depends(get_db)):
+    return {"patient_id": patient_id, "permission": permission,
+            "user_ids": consent_index.users_for_patient(db, patient_id, permission)}
+
+
+@router.get("/consent-matrix/users/{user_id}/patients")
+def patients_accessible(user_id: int, permission: Literal["view", "edit"] = "view", db: Session = Depends(get_db)):
+    return {"user_id": user_id, "permission": permission,
+            "patient_ids": consent_index.patients_for_user(db, user_id, permission)}
+
+
+@router.get("/consent-matrix/index/stats")
+def consent_index_stats():
+    return consent_index.stats()
+
+
+# ------------------ Prometheus ------------------
+@router.get("/metrics/prometheus", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Per-route latency histograms, in-flight requests and SQL accounting in Prometheus text format."""
+    return PlainTextResponse(instrumentation.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response, Request
 from sqlalchemy.orm import Session
+from typing import Optional
 import models, schemas, crud
 from database import get_db
+from bulk_ingest import ingest_request
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
@@ -10,5 +12,24 @@ def create_patient(patient: schemas.PatientCreate, db: Session = Depends(get_db)
     return crud.create_patient(db, patient)
 
 @router.get("/", response_model=list[schemas.PatientResponse])
-def get_patients(db: Session = Depends(get_db)):
-    return crud.get_patients(db)
+def get_patients(
+    response: Response,
+    db: Session = Depends(get_db),
+    search: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Lists patients (id/name/dob/record_id only). `search` matches on name;
+    with `limit`, pages by id and returns the next cursor in X-Next-Cursor.
+    """
+    return crud.get_patients(db, search=search, limit=limit, cursor=cursor, response=response)
+
+
+@router.post("/bulk")
+async def bulk_create_patients(request: Request, db: Session = Depends(get_db)):
+    """
+    Bulk-load patients from a JSON array or a streamed CSV body
+    (Content-Type: text/csv). Returns per-row conflicts.
+    """
+    return await ingest_request(request, db, "patients")
@@ -1,103 +1,65 @@
 # routers/reports.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from datetime import datetime
+from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from io import BytesIO
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from fastapi.responses import StreamingResponse
-import models
-from database import get_db
-from routers.metrics import metrics_overview
+import report_jobs
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
-@router.get("/audit")
-def generate_audit_report(db: Session = Depends(get_db)):
-    since_minutes = 1440
-    metrics = metrics_overview(db, since_minutes)
-    alerts = db.query(models.Alert).order_by(models.Alert.created_at.desc()).limit(10).all()
+# How long GET /reports/audit waits for a render before answering 202.
+AUDIT_WAIT_SECONDS = 60
 
-    # Chart
-    fig, ax = plt.subplots(figsize=(6, 3))
-    if metrics["series"]:
-        df = metrics["series"]
-        buckets = [r["bucket"] for r in df]
-        auth = [r["authorized"] for r in df]
-        breach = [r["breaches"] for r in df]
-        ax.plot(buckets, auth, label="Authorized", color="green", marker="o")
-        ax.plot(buckets, breach, label="Breaches", color="red", marker="o")
-        ax.legend()
-        ax.set_xlabel("Time")
-        ax.set_ylabel("Access Count")
-        ax.set_title("Access Trend (Last 24h)")
-    else:
-        ax.text(0.5, 0.5, "No Data", ha='center', va='center')
 
-    img_buf = BytesIO()
-    plt.tight_layout()
-    plt.savefig(img_buf, format="png")
-    plt.close(fig)
-    img_buf.seek(0)
+def _pdf_response(pdf: bytes):
+    return StreamingResponse(
+        BytesIO(pdf), media_type="application/pdf",
+        headers={"Content-Disposition": "inline; filename=PHIPA_Audit_Report.pdf"}
+    )
 
-    # PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    elements = []
 
-    elements.append(Paragraph("<b>PHIPA Audit Summary Report</b>", styles["Title"]))
-    elements.append(Spacer(1, 12))
+@router.get("/audit")
+def generate_audit_report(since_minutes: int = 1440):
+    """
+    Returns the audit PDF for the window, from the artifact cache when a
+    fresh copy exists (the daily report is pre-generated), otherwise
+    rendering it on a report worker and waiting for the result.
+    """
+    job = report_jobs.queue.submit(since_minutes)
+    if not job.done.wait(AUDIT_WAIT_SECONDS):
+        return JSONResponse(status_code=202, content=jsonable_encoder(job.to_dict()))
+    if job.status == report_jobs.FAILED:
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {job.error}")
+    return _pdf_response(job.pdf)
 
-    summary_data = [
-        ["Generated On", datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")],
-        ["Time Window", "Last 24 Hours"],
-        ["Compliance (%)", f"{metrics['compliance_pct']} %"],
-        ["Total Accesses", metrics["total_accesses"]],
-        ["Authorized Accesses", metrics["authorized_accesses"]],
-        ["Breaches", metrics["breaches"]],
-        ["Open Alerts", metrics["open_alerts"]],
-    ]
-    summary_table = Table(summary_data, colWidths=[150, 200])
-    summary_table.setStyle(TableStyle([
-        ("BOX", (0, 0), (-1, -1), 0.25, colors.black),
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 12))
 
-    elements.append(Paragraph("<b>Access Trend</b>", styles["Heading2"]))
-    chart_path = "trend_chart.png"
-    with open(chart_path, "wb") as f:
-        f.write(img_buf.getvalue())
-    elements.append(Image(chart_path, width=400, height=200))
-    elements.append(Spacer(1, 12))
+@router.post("/audit/jobs", status_code=202)
+def create_audit_report_job(since_minutes: int = 1440, force: bool = False):
+    """Queues an audit report for the window; poll /reports/jobs/{job_id}."""
+    return report_jobs.queue.submit(since_minutes, force=force).to_dict()
 
-    elements.append(Paragraph("<b>Recent Breach Alerts</b>", styles["Heading2"]))
-    if alerts:
-        alert_rows = [["Date", "Message", "Resolved"]]
-        for a in alerts:
-            alert_rows.append([
-                a.created_at.strftime("%Y-%m-%d %H:%M"),
-                a.message,
-                "Yes" if a.resolved else "No"
-            ])
-        alert_table = Table(alert_rows, colWidths=[100, 280, 60])
-        alert_table.setStyle(TableStyle([
-            ("BOX", (0, 0), (-1, -1), 0.25, colors.black),
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-        ]))
-        elements.append(alert_table)
-    else:
-        elements.append(Paragraph("No breach alerts recorded.", styles["Normal"]))
 
-    doc.build(elements)
-    buffer.seek(0)
+@router.get("/jobs/stats")
+def report_job_stats():
+    return report_jobs.queue.stats()
 
-    return StreamingResponse(
-        buffer, media_type="application/pdf",
-        headers={"Content-Disposition": "inline; filename=PHIPA_Audit_Report.pdf"}
-    )
+
+@router.get("/jobs/{job_id}")
+def get_report_job(job_id: str):
+    job = report_jobs.queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found.")
+    return job.to_dict()
+
+
+@router.get("/{job_id}")
+def download_report(job_id: str):
+    """Streams the finished PDF for a report job."""
+    job = report_jobs.queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found.")
+    if job.status == report_jobs.FAILED:
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {job.error}")
+    if job.status != report_jobs.DONE:
+        raise HTTPException(status_code=409, detail=f"Report is {job.status}.")
+    return _pdf_response(job.pdf)
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response, Request
 from sqlalchemy.orm import Session
+from typing import Optional
 import models, schemas, crud
 from database import get_db
+from bulk_ingest import ingest_request
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -13,5 +15,25 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return crud.create_user(db, user)
 
 @router.get("/", response_model=list[schemas.UserResponse])
-def get_users(db: Session = Depends(get_db)):
-    return crud.get_users(db)
+def get_users(
+    response: Response,
+    db: Session = Depends(get_db),
+    search: Optional[str] = None,
+    role: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Lists users (id/name/role/email only). `search` matches on name; with
+    `limit`, pages by id and returns the next cursor in X-Next-Cursor.
+    """
+    return crud.get_users(db, search=search, role=role, limit=limit, cursor=cursor, response=response)
+
+
+@router.post("/bulk")
+async def bulk_create_users(request: Request, db: Session = Depends(get_db)):
+    """
+    Bulk-load users from a JSON array or a streamed CSV body
+    (Content-Type: text/csv). Returns per-row conflicts.
+    """
+    return await ingest_request(request, db, "users")
@@ -1,7 +1,7 @@
 # schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 # ----------------- Alert Schemas -----------------
 class AlertBase(BaseModel):
@@ -72,6 +72,18 @@ class AccessLogBase(BaseModel):
     patient_id: int
     action: str
 
+class AccessBatchRequest(BaseModel):
+    items: List[AccessLogBase] = Field(..., max_length=5000)
+
+class AccessDecision(AccessLogBase):
+    authorized: bool
+    reason: Optional[str] = None
+
+class AccessBatchResponse(BaseModel):
+    granted: int
+    denied: int
+    results: List[AccessDecision]
+
 class AccessLogResponse(AccessLogBase):
     id: int
     timestamp: datetime
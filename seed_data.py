@@ -1,24 +1,27 @@
 # seed_data.py
 from datetime import datetime
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from database import Base
+from sqlalchemy import text
+from database import Base, SessionLocal, engine
 import models
+from migrations import run_migrations
+import partitions
+import rollups
 
 # -------------------------------------------------
 # DATABASE SETUP
 # -------------------------------------------------
-DATABASE_URL = "sqlite:///./privacy_governance.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine)
+# Same engine (DATABASE_URL, pool, SQLite pragmas) as the API.
 db = SessionLocal()
 
 # -------------------------------------------------
 # RECREATE SCHEMA
 # -------------------------------------------------
 print("Recreating database...")
+partitions.drop_all(engine)
 Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
+with engine.begin() as conn:
+    conn.execute(text("DROP TABLE IF EXISTS schema_version"))
+run_migrations(engine)
 
 # -------------------------------------------------
 # SEED USERS
@@ -74,6 +77,7 @@ logs = [
 ]
 db.add_all(logs)
 db.commit()
+rollups.rebuild(engine)
 
 # -------------------------------------------------
 # CONFIRMATION
@@ -3,13 +3,23 @@ import time
 import requests
 import pandas as pd
 import streamlit as st
-from datetime import datetime
-from io import BytesIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # -------------------------------------------------------------------
 # 🌐 API Configuration
 # -------------------------------------------------------------------
 API_BASE = os.getenv("API_BASE", "https://phipa-privacy-governance.onrender.com")
+# Download links are opened by the browser, so they need the API's public address.
+PUBLIC_API_BASE = os.getenv("PUBLIC_API_BASE", API_BASE)
+FETCH_WORKERS = int(os.getenv("DASHBOARD_FETCH_WORKERS", "8"))
+HTTP_POOL_SIZE = int(os.getenv("DASHBOARD_HTTP_POOL_SIZE", "16"))
+# Users, patients and the consent matrix change rarely; everything else is live.
+REFERENCE_TTL_SECONDS = int(os.getenv("DASHBOARD_REFERENCE_TTL_SECONDS", "300"))
 
 st.set_page_config(
     page_title="PHIPA Compliance Dashboard",
@@ -23,18 +33,105 @@ st.caption("Live compliance telemetry for healthcare data access • demo system
 # -------------------------------------------------------------------
 # 🧭 Helper Functions
 # -------------------------------------------------------------------
-def fetch(path, params=None):
-    """Wrapper for safe API requests."""
+@st.cache_resource
+def http_session():
+    """One pooled keep-alive session shared by every rerun and browser tab."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def fetch_pool():
+    return ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="dashboard-fetch")
+
+
+def api_get(path, params=None):
+    """GET an endpoint and return its JSON; raises on HTTP or network errors."""
+    r = http_session().get(f"{API_BASE}{path}", params=params, timeout=30)
+    r.raise_for_status()
+    return r.json()
+
+
+@st.cache_data(ttl=REFERENCE_TTL_SECONDS, show_spinner=False)
+def fetch_reference(path, params=None):
+    """Cached GET for reference data. Errors are raised, so they are never cached."""
+    return api_get(path, params)
+
+
+def invalidate_reference():
+    fetch_reference.clear()
+
+
+def submit(path, params=None, cached=False):
+    """Start a GET on the fetch pool and return its future."""
+    ctx = get_script_run_ctx()
+    fn = fetch_reference if cached else api_get
+
+    def run():
+        add_script_run_ctx(None, ctx)  # lets the worker use st.cache_data
+        return fn(path, params)
+
+    return path, params, fetch_pool().submit(run)
+
+
+def result(pending):
+    """Wait for a submitted fetch; reports errors on the page and returns None."""
+    path, params, future = pending
     try:
-        r = requests.get(f"{API_BASE}{path}", params=params, timeout=30)
-        st.caption(f"→ Fetching {path} with {params}")
-        r.raise_for_status()
-        return r.json()
+        return future.result()
     except Exception as e:
         st.error(f"API error on {path}: {e}")
         return None
 
 
+def refresh_log_buffer(since_minutes, limit_logs):
+    """
+    Keep st.session_state.log_buffer, a ring buffer of the newest `limit_logs`
+    rows in the window, current. After the first load only rows past the id
+    watermark are fetched; a filter change or a backlog that would replace the
+    whole buffer falls back to a full reload.
+    """
+    key = (since_minutes, limit_logs)
+    buf = st.session_state.get("log_buffer")
+    watermark = st.session_state.get("log_watermark")
+    window = {"limit": limit_logs, "since_minutes": since_minutes}
+
+    new_rows = None
+    if buf is not None and watermark is not None and st.session_state.get("log_buffer_key") == key:
+        new_rows = result(submit("/logs", {**window, "after_id": watermark}))
+        if new_rows is None:
+            return list(buf)
+        if len(new_rows) >= limit_logs:
+            new_rows = None
+    if new_rows is None:
+        rows = result(submit("/logs", window))
+        if rows is None:
+            return list(buf) if buf is not None else []
+        buf = deque(reversed(rows), maxlen=limit_logs)
+    else:
+        buf.extend(new_rows)
+
+    # Drop rows that have aged out of the window.
+    cutoff = datetime.utcnow() - timedelta(minutes=since_minutes)
+    if buf and datetime.fromisoformat(buf[0]["timestamp"]) < cutoff:
+        buf = deque((r for r in buf if datetime.fromisoformat(r["timestamp"]) >= cutoff), maxlen=limit_logs)
+
+    st.session_state.log_buffer = buf
+    st.session_state.log_buffer_key = key
+    st.session_state.log_watermark = max(r["id"] for r in buf) if buf else None
+    return list(buf)
+
+
+def fetch_live(since_minutes, limit_logs):
+    """Metrics and logs for the current filters, fetched in parallel."""
+    metrics = submit("/metrics/overview", {"since_minutes": since_minutes})
+    logs = refresh_log_buffer(since_minutes, limit_logs)
+    return result(metrics) or {}, logs
+
+
 def colored_metric(label, value, delta=None, threshold=None, suffix="%"):
     """Display KPI metric box with color-coded emoji."""
     color_emoji = "🟢"
@@ -53,21 +150,27 @@ def colored_metric(label, value, delta=None, threshold=None, suffix="%"):
     st.metric(f"{color_emoji} {label}", display_value, delta)
 
 
-def convert_df_to_csv(df: pd.DataFrame):
-    """Convert DataFrame to CSV bytes for download."""
-    return df.to_csv(index=False).encode("utf-8")
-
-
-def convert_df_to_excel(df: pd.DataFrame):
-    """Convert DataFrame to Excel bytes for download."""
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="data")
-    return buffer.getvalue()
+def download_links(label, path, formats=("csv", "xlsx", "parquet"), **params):
+    """
+    Link buttons to the API's /download endpoints. Files are generated and
+    streamed by the API when clicked, not encoded here on every rerun.
+    """
+    names = {"csv": "CSV", "xlsx": "Excel", "parquet": "Parquet"}
+    cols = st.columns(len(formats))
+    for col, fmt in zip(cols, formats):
+        url = f"{PUBLIC_API_BASE}{path}?{urlencode({**params, 'format': fmt})}"
+        col.link_button(f"⬇️ Download {label} ({names[fmt]})", url, use_container_width=True)
 
 # -------------------------------------------------------------------
 # 🧩 Sidebar: Filters & Simulation Tools
 # -------------------------------------------------------------------
+# Everything that does not depend on the filters starts loading now, in parallel.
+pending_users = submit("/users/", cached=True)
+pending_patients = submit("/patients/", cached=True)
+pending_consents = submit("/consent-matrix", {"sparse": True, "limit": 1000}, cached=True)
+pending_alerts = submit("/alerts", {"limit": 100, "unresolved_only": False})
+pending_summaries = submit("/incidents/summaries")
+
 st.sidebar.header("📋 Filters")
 
 with st.sidebar.form("filters_form"):
@@ -75,8 +178,8 @@ with st.sidebar.form("filters_form"):
     limit_logs = st.slider("Max rows (logs)", 50, 2000, 500, 50)
 
     # Load users/patients for dropdowns
-    users = fetch("/users/") or []
-    patients = fetch("/patients/") or []
+    users = result(pending_users) or []
+    patients = result(pending_patients) or []
 
     user_map = {u["id"]: f'{u["name"]} ({u["role"]})' for u in users}
     patient_map = {p["id"]: f'{p["name"]} [#{p["id"]}]' for p in patients}
@@ -108,7 +211,7 @@ sim_action = st.sidebar.selectbox("Simulated action", ["view", "edit", "export"]
 if st.sidebar.button("🚨 Simulate Unauthorized Access"):
     if sel_user_sim and sel_patient_sim:
         payload = {"user_id": sel_user_sim, "patient_id": sel_patient_sim, "action": sim_action}
-        resp = requests.post(f"{API_BASE}/access/", json=payload)
+        resp = http_session().post(f"{API_BASE}/access/", json=payload, timeout=30)
         if resp.status_code == 200:
             st.sidebar.success("✅ Access simulated successfully.")
         else:
@@ -116,6 +219,10 @@ if st.sidebar.button("🚨 Simulate Unauthorized Access"):
     else:
         st.sidebar.warning("Please select both a user and a patient first.")
 
+if st.sidebar.button("♻️ Reload users, patients & consents"):
+    invalidate_reference()
+    st.rerun()
+
 # -------------------------------------------------------------------
 # 📊 Load Data with Persistent State
 # -------------------------------------------------------------------
@@ -127,8 +234,7 @@ if "logs" not in st.session_state:
 # Fetch only when filters applied or first load
 if apply_filters or st.session_state.first_load:
     with st.spinner("Fetching filtered data..."):
-        st.session_state.metrics = fetch("/metrics/overview", params={"since_minutes": since_minutes}) or {}
-        st.session_state.logs = fetch("/logs", params={"limit": limit_logs, "since_minutes": since_minutes}) or []
+        st.session_state.metrics, st.session_state.logs = fetch_live(since_minutes, limit_logs)
     st.session_state.first_load = False
 
 metrics = st.session_state.metrics
@@ -194,10 +300,7 @@ if logs:
     st.dataframe(display_df, use_container_width=True, height=360)
 
 
-    csv = convert_df_to_csv(display_df)
-    excel = convert_df_to_excel(display_df)
-    st.download_button("⬇️ Download Access Logs (CSV)", csv, "access_logs.csv", "text/csv")
-    st.download_button("⬇️ Download Access Logs (Excel)", excel, "access_logs.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    download_links("Access Logs", "/download/logs", since_minutes=since_minutes, limit=limit_logs)
 
 else:
     st.info("No access logs found for the selected window or filters.")
@@ -208,7 +311,7 @@ st.divider()
 # 🚨 Alerts
 # -------------------------------------------------------------------
 st.subheader("🚨 Active Alerts")
-alerts = fetch("/alerts", params={"limit": 100, "unresolved_only": False}) or []
+alerts = result(pending_alerts) or []
 if alerts:
     df_alerts = pd.json_normalize(alerts)
     df_alerts["created_at"] = pd.to_datetime(df_alerts["created_at"])
@@ -219,8 +322,7 @@ if alerts:
         }),
         use_container_width=True, height=260
     )
-    csv = convert_df_to_csv(df_alerts)
-    st.download_button("⬇️ Download Alerts (CSV)", csv, "alerts.csv", "text/csv")
+    download_links("Alerts", "/download/alerts", limit=100)
 else:
     st.success("No unresolved alerts 🎉")
 
@@ -230,7 +332,7 @@ st.divider()
 # 🧠 Incident Summaries
 # -------------------------------------------------------------------
 st.subheader("🧠 Incident Summaries (Narrative)")
-summ = fetch("/incidents/summaries")
+summ = result(pending_summaries)
 if summ:
     df_sum = pd.json_normalize(summ)
     df_sum["created_at"] = pd.to_datetime(df_sum["created_at"])
@@ -246,7 +348,8 @@ st.divider()
 # 🧩 Consent Matrix
 # -------------------------------------------------------------------
 with st.expander("🧾 Consent Matrix (who can view/edit whom)"):
-    cm = fetch("/consent-matrix") or []
+    # Sparse mode: only existing grants, first page only.
+    cm = result(pending_consents) or []
     if cm:
         df_cm = pd.DataFrame(cm)
         df_cm = df_cm[["user_name", "role", "patient_name", "can_view", "can_edit"]]
@@ -255,8 +358,7 @@ with st.expander("🧾 Consent Matrix (who can view/edit whom)"):
             "can_view": "Can View", "can_edit": "Can Edit"
         })
         st.dataframe(df_cm, use_container_width=True, height=280)
-        csv = convert_df_to_csv(df_cm)
-        st.download_button("⬇️ Download Consent Matrix (CSV)", csv, "consent_matrix.csv", "text/csv")
+        download_links("Consent Matrix", "/download/consents")
     else:
         st.info("No consents yet. Create some to populate the matrix.")
 
@@ -267,8 +369,7 @@ st.divider()
 col1, col2 = st.columns([0.25, 0.75])
 with col1:
     if st.button("🔄 Refresh Data"):
-        st.session_state.metrics = fetch("/metrics/overview", params={"since_minutes": since_minutes}) or {}
-        st.session_state.logs = fetch("/logs", params={"limit": limit_logs, "since_minutes": since_minutes}) or {}
+        st.session_state.metrics, st.session_state.logs = fetch_live(since_minutes, limit_logs)
         st.session_state.last_refresh = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
         st.rerun()
 with col2:
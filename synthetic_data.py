@@ -0,0 +1,240 @@
+# synthetic_data.py
+"""
+Synthetic data at realistic scale, for load tests and benchmarks.
+
+seed_data.py loads a handful of demo rows; this generates users by role,
+patients, consents at a given density and access logs spread over a time
+range with a configurable denial rate. Denied accesses get an alert, as the
+API would have raised. Rows are generated in chunks and bulk-inserted with
+executemany, so millions of logs load in seconds and memory stays flat.
+It is the one data generator: the benchmarks seed through it as well
+(benchmarks/_common.populate).
+
+    python synthetic_data.py --reset --users Doctor=600,Nurse=1200,Admin=200 \
+        --patients 200000 --consent-density 0.0005 --logs 5000000 --days 180
+
+Access decisions follow routers/access.py: `view` needs can_view, `edit`
+needs can_edit, anything else (`export`) is denied. Authorized logs are drawn
+from existing consents; denials are a mix of accesses without consent and
+actions the consent does not allow. Timestamps increase with the log id.
+"""
+import argparse
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, text
+
+import models
+import partitions
+import rollups
+from database import Base, engine
+from migrations import run_migrations
+
+SYNTH_CHUNK_ROWS = 50_000
+
+DEFAULT_ROLES = {"Doctor": 60, "Nurse": 120, "Admin": 20}
+# Share of each role's consents that also allow edits.
+EDIT_SHARE = {"Doctor": 0.5, "Nurse": 0.3, "Admin": 0.0}
+NO_CONSENT = "No consent exists for this user and patient."
+NO_PERMISSION = "User lacks required permission."
+
+
+def parse_roles(spec: str) -> dict:
+    """'Doctor=60,Nurse=120' -> {'Doctor': 60, 'Nurse': 120}"""
+    roles = {}
+    for part in spec.split(","):
+        role, _, count = part.partition("=")
+        roles[role.strip()] = int(count)
+    return roles
+
+
+def reset(bind=engine):
+    """Drop everything (partitions included) and migrate an empty schema."""
+    partitions.drop_all(bind)
+    Base.metadata.drop_all(bind=bind)
+    with bind.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS schema_version"))
+    run_migrations(bind)
+
+
+def _insert_chunks(bind, table, rows):
+    """executemany `rows` (an iterable of dicts) in SYNTH_CHUNK_ROWS transactions."""
+    total = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, SYNTH_CHUNK_ROWS))
+        if not chunk:
+            return total
+        with bind.begin() as conn:
+            conn.execute(insert(table), chunk)
+        total += len(chunk)
+
+
+def _next_id(bind, column) -> int:
+    with bind.connect() as conn:
+        return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _sync_sequence(bind, column):
+    """Rows are inserted with explicit ids; move the Postgres sequence past them."""
+    if bind.dialect.name != "postgresql":
+        return
+    table = column.table.name
+    with bind.begin() as conn:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', '{column.name}'), "
+            f"(SELECT MAX({column.name}) FROM {table}))"
+        ))
+
+
+# ---------------- Reference data ----------------
+def _users(first_id: int, roles: dict):
+    uid = first_id
+    for role, count in roles.items():
+        for _ in range(count):
+            yield {"id": uid, "name": f"{role} {uid}", "role": role, "email": f"{role.lower()}{uid}@synthetic.example"}
+            uid += 1
+
+
+def _patients(rnd, first_id: int, count: int):
+    for pid in range(first_id, first_id + count):
+        dob = datetime(1930, 1, 1) + timedelta(days=rnd.randrange(90 * 365))
+        yield {"id": pid, "name": f"Patient {pid}", "dob": dob.strftime("%Y-%m-%d"), "record_id": f"SYN{pid:09d}"}
+
+
+def _consents(rnd, users: list, patient_ids: range, density: float, now: datetime, grants: list):
+    """Each user consents to ~density of the patients; the pairs are collected in `grants`."""
+    per_user = density * len(patient_ids)
+    for uid, role in users:
+        k = min(len(patient_ids), int(per_user) + (rnd.random() < per_user % 1))
+        for pid in rnd.sample(patient_ids, k):
+            can_edit = rnd.random() < EDIT_SHARE.get(role, 0.3)
+            grants.append((uid, pid, can_edit))
+            yield {"user_id": uid, "patient_id": pid, "can_view": True, "can_edit": can_edit,
+                   "created_at": now - timedelta(days=rnd.randrange(365))}
+
+
+# ---------------- Access logs ----------------
+def _logs(rnd, first_id: int, count: int, start: datetime, end: datetime, user_ids: list,
+          patient_ids: range, grants: list, denial_rate: float, alerts: list):
+    """
+    `count` logs with increasing timestamps in [start, end). Timestamps are
+    sorted within each chunk and chunks cover consecutive slices of the range,
+    so ids follow time. Alerts for denied accesses are appended to `alerts`.
+    """
+    span = (end - start).total_seconds()
+    chunks = max(1, -(-count // SYNTH_CHUNK_ROWS))
+    log_id = first_id
+    for c in range(chunks):
+        n = count // chunks + (c < count % chunks)
+        lo, hi = span * c / chunks, span * (c + 1) / chunks
+        for offset in sorted(rnd.uniform(lo, hi) for _ in range(n)):
+            ts = start + timedelta(seconds=offset)
+            if grants and rnd.random() >= denial_rate:
+                uid, pid, can_edit = grants[rnd.randrange(len(grants))]
+                action = "edit" if can_edit and rnd.random() < 0.2 else "view"
+                authorized, reason = True, ""
+            elif grants and rnd.random() < 0.5:
+                uid, pid, can_edit = grants[rnd.randrange(len(grants))]
+                action = "export" if can_edit or rnd.random() < 0.5 else "edit"
+                authorized, reason = False, NO_PERMISSION
+            else:
+                # Random pairs almost never have consent at realistic densities.
+                uid, pid = rnd.choice(user_ids), rnd.choice(patient_ids)
+                action = rnd.choice(("view", "view", "edit", "export"))
+                authorized, reason = False, NO_CONSENT
+            if not authorized:
+                alerts.append({
+                    "user_id": uid, "patient_id": pid, "access_log_id": log_id,
+                    "message": f"Unauthorized access by user {uid}: {reason}",
+                    "created_at": ts, "resolved": rnd.random() < 0.3,
+                })
+            yield {"id": log_id, "user_id": uid, "patient_id": pid, "action": action,
+                   "timestamp": ts, "is_authorized": authorized}
+            log_id += 1
+
+
+def generate(bind=engine, roles: dict = None, patients: int = 2_000, consent_density: float = 0.01,
+             logs: int = 100_000, days: float = 30, denial_rate: float = 0.05, seed: int = 24,
+             now: datetime = None) -> dict:
+    """Append synthetic rows to the database at `bind`. Returns row counts and load times."""
+    rnd = random.Random(seed)
+    roles = DEFAULT_ROLES if roles is None else roles
+    now = now or datetime.utcnow()
+    stats = {}
+
+    def timed(name, table, rows):
+        start = time.perf_counter()
+        stats[name] = {"rows": _insert_chunks(bind, table, rows), "seconds": round(time.perf_counter() - start, 2)}
+
+    first_user = _next_id(bind, models.User.id)
+    users = list(_users(first_user, roles))
+    timed("users", models.User, users)
+    _sync_sequence(bind, models.User.id)
+    first_patient = _next_id(bind, models.Patient.id)
+    patient_ids = range(first_patient, first_patient + patients)
+    timed("patients", models.Patient, _patients(rnd, first_patient, patients))
+    _sync_sequence(bind, models.Patient.id)
+
+    grants = []
+    timed("consents", models.Consent,
+          _consents(rnd, [(u["id"], u["role"]) for u in users], patient_ids, consent_density, now, grants))
+
+    alerts = []
+    log_rows = _logs(rnd, _next_id(bind, models.AccessLog.id), logs, now - timedelta(days=days), now,
+                     [u["id"] for u in users], patient_ids, grants, denial_rate, alerts)
+    # After each chunk of logs, write the alerts it produced.
+    start = time.perf_counter()
+    stats["access_logs"] = {"rows": 0}
+    stats["alerts"] = {"rows": 0}
+    while True:
+        written = _insert_chunks(bind, models.AccessLog, itertools.islice(log_rows, SYNTH_CHUNK_ROWS))
+        stats["alerts"]["rows"] += _insert_chunks(bind, models.Alert, alerts)
+        alerts.clear()
+        if not written:
+            break
+        stats["access_logs"]["rows"] += written
+    _sync_sequence(bind, models.AccessLog.id)
+    stats["access_logs"]["seconds"] = round(time.perf_counter() - start, 2)
+
+    start = time.perf_counter()
+    rollups.rebuild(bind)
+    stats["rollups"] = {"seconds": round(time.perf_counter() - start, 2)}
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load synthetic users, patients, consents and access logs.")
+    parser.add_argument("--users", type=parse_roles, default=DEFAULT_ROLES,
+                        help="users per role, e.g. Doctor=600,Nurse=1200,Admin=200")
+    parser.add_argument("--patients", type=int, default=2_000)
+    parser.add_argument("--consent-density", type=float, default=0.01,
+                        help="share of (user, patient) pairs with a consent")
+    parser.add_argument("--logs", type=int, default=100_000)
+    parser.add_argument("--days", type=float, default=30, help="logs are spread over the last N days")
+    parser.add_argument("--denial-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=24)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate the schema first")
+    parser.add_argument("--seal", action="store_true", help="seal past months into partitions afterwards")
+    args = parser.parse_args()
+
+    if args.reset:
+        reset(engine)
+    else:
+        run_migrations(engine)
+    stats = generate(engine, args.users, args.patients, args.consent_density, args.logs,
+                     args.days, args.denial_rate, args.seed)
+    if args.seal:
+        start = time.perf_counter()
+        sealed = partitions.seal(engine)
+        stats["sealed"] = {"months": len(sealed), "seconds": round(time.perf_counter() - start, 2)}
+
+    for name, s in stats.items():
+        rate = f"  ({s['rows'] / s['seconds']:,.0f} rows/s)" if s.get("rows") and s.get("seconds") else ""
+        print(f"{name:<12} " + "  ".join(f"{k}={v:,}" for k, v in s.items()) + rate)
+
+
+if __name__ == "__main__":
+    main()